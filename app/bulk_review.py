@@ -0,0 +1,239 @@
+import os, json, uuid, asyncio, zipfile
+from functools import partial
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi import APIRouter, File, UploadFile, Form
+from .helpers.llm import get_client
+from .helpers import call_policy
+from .helpers.call_policy import error_status
+from .helpers.scheduler import get_scheduler
+from .helpers.pdf import check_size, PDFError, PDF_MAX_BYTES, PDF_WORKERS
+from .helpers.resume_ingest import ingest_resume
+from .helpers.review_parser import parse_review, ReviewParseError
+from .resume_review import review_params
+from .database import SessionLocal, ReviewJob, utcnow
+
+router = APIRouter()
+
+# Bulk reviews: many resumes against one job description, sent to the LLM as a single Message Batch.
+# Uploads are parsed in parallel by the PDF pool, the batch is submitted once, and clients poll for results.
+BULK_MAX_FILES = int(os.getenv("BULK_MAX_FILES", "500"))  # PDFs per job, counting the ones inside zips
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(100 * 1024 * 1024)))  # PDF bytes per job, after unzipping
+BULK_PARSE_CONCURRENCY = int(os.getenv("BULK_PARSE_CONCURRENCY", str(PDF_WORKERS * 2)))  # PDFs held in memory at once
+
+ZIP_TYPES = {"application/zip", "application/x-zip-compressed"}
+
+def open_zip(file):
+    # (archive, .pdf entries); only the central directory is read here, the entries are read one at a time
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise PDFError("File isn't a valid zip")
+    entries = [info for info in archive.infolist() if not info.is_dir() and info.filename.lower().endswith(".pdf")]
+    if len(entries) > BULK_MAX_FILES:
+        archive.close()
+        raise PDFError(f"Zip has {len(entries)} PDFs; the limit is {BULK_MAX_FILES}")
+    return archive, entries
+
+def read_entry(archive, info):
+    # read through a bounded stream so a zip bomb can't inflate past the PDF size limit
+    with archive.open(info) as entry:
+        return entry.read(PDF_MAX_BYTES + 1)
+
+async def collect_uploads(files, archives):
+    # (filename, read or None, error or None) for every PDF, counting the ones inside zips; read() returns the
+    # bytes. Nothing is read yet, so the file limit is checked before any PDF is held in memory. Zips are read
+    # from the spooled upload and the opened archives are added to archives for the caller to close.
+    uploads = []
+    for file in files:
+        if file.content_type in ZIP_TYPES or (file.filename or "").lower().endswith(".zip"):
+            try:
+                archive, entries = await asyncio.to_thread(open_zip, file.file)
+            except PDFError as e:
+                uploads.append((file.filename, None, str(e)))
+                continue
+            archives.append(archive)
+            uploads.extend((info.filename, partial(asyncio.to_thread, read_entry, archive, info), None) for info in entries)
+        elif file.content_type == "application/pdf":
+            try:
+                check_size(file.size)
+                uploads.append((file.filename, file.read, None))
+            except PDFError as e:
+                uploads.append((file.filename, None, str(e)))
+        else:
+            uploads.append((file.filename, None, "File isn't a PDF or zip"))
+    return uploads
+
+async def parse_uploads(uploads):
+    # [(resume_id, text, error)] in upload order. Each PDF is parsed as soon as it is read and its bytes are
+    # dropped once parsed, so at most BULK_PARSE_CONCURRENCY PDFs are in memory at a time, and reading stops
+    # once the job has read BULK_MAX_BYTES; the files after that are reported as too large instead.
+    slots = asyncio.Semaphore(BULK_PARSE_CONCURRENCY)
+    results = []
+    total = 0
+
+    async def parse(pdf_bytes):
+        # a file that can't be parsed is reported in the results instead of failing the job
+        try:
+            resume_id, text, _ = await ingest_resume(pdf_bytes)
+            return resume_id, text, None
+        except Exception as e:
+            return None, None, str(e)
+        finally:
+            slots.release()
+
+    over_budget = f"The job's files are over the {BULK_MAX_BYTES // (1024 * 1024)} MB limit"
+    try:
+        for _, read, error in uploads:
+            if error is None and total > BULK_MAX_BYTES:
+                error = over_budget
+            if error is None:
+                await slots.acquire()
+                try:
+                    # a corrupt (bad CRC, bad deflate stream), encrypted or unsupported zip entry fails here
+                    pdf_bytes = await read()
+                    total += len(pdf_bytes)
+                    check_size(len(pdf_bytes))
+                    error = over_budget if total > BULK_MAX_BYTES else None
+                except Exception as e:
+                    error = str(e)
+                if error is None:
+                    results.append(asyncio.create_task(parse(pdf_bytes)))
+                    continue
+                slots.release()
+            results.append((None, None, error))
+        return [await result if isinstance(result, asyncio.Task) else result for result in results]
+    except BaseException:
+        for result in results:
+            if isinstance(result, asyncio.Task):
+                result.cancel()
+        raise
+
+async def collect_results(batch_id, items):
+    outcomes = {}
+    async for entry in await get_client().messages.batches.results(batch_id):
+        outcomes[entry.custom_id] = entry.result
+
+    results = []
+    for item in items:
+        result = {"filename": item["filename"], "resume_id": item["resume_id"], "data": None, "error": item["error"]}
+        outcome = outcomes.get(item["custom_id"])
+        if item["custom_id"] is None:
+            pass
+        elif outcome is None:
+            result["error"] = "No result returned for this resume"
+        elif outcome.type == "succeeded":
+            try:
+                review, complete = parse_review(outcome.message.content[0].text)
+                result["data"] = review.model_dump()
+                if not complete:
+                    result["error"] = "Review was cut off; only the complete categories are included"
+            except ReviewParseError:
+                result["error"] = "Invalid response format"
+        elif outcome.type == "errored":
+            result["error"] = outcome.error.error.message
+        else:
+            result["error"] = f"Review {outcome.type}"  # canceled or expired
+        results.append(result)
+    return results
+
+def job_summary(job, request_counts=None):
+    items = json.loads(job.items)
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "total": len(items),
+        "submitted": sum(1 for item in items if item["custom_id"]),
+        "request_counts": request_counts,
+        "results": json.loads(job.results) if job.results else None,
+    }
+
+@router.post("/resume-review/bulk")
+async def bulk_review(job_description: str = Form(...), files: List[UploadFile] = File(...)):
+    db = SessionLocal()
+    archives = []
+    try:
+        uploads = await collect_uploads(files, archives)
+        if len(uploads) > BULK_MAX_FILES:
+            return JSONResponse(content={
+                "data": {},
+                "message": f"{len(uploads)} resumes uploaded; the limit is {BULK_MAX_FILES}",
+                "error": True
+            }, status_code=400)
+
+        parsed = await parse_uploads(uploads)
+
+        items = []
+        requests = []
+        for index, ((filename, _, _), (resume_id, text, error)) in enumerate(zip(uploads, parsed)):
+            custom_id = f"resume-{index}" if error is None else None
+            items.append({"custom_id": custom_id, "filename": filename, "resume_id": resume_id, "error": error})
+            if custom_id:
+                requests.append({"custom_id": custom_id, "params": review_params(text, job_description)})
+
+        batch = None
+        if requests:
+            # one submission call, queued behind interactive traffic
+            async with get_scheduler().slot("bulk"):
+                batch = await call_policy.call("bulk", lambda: get_client().messages.batches.create(requests=requests))
+
+        job = ReviewJob(job_id=uuid.uuid4().hex, batch_id=batch.id if batch else None, status="processing" if batch else "ended", items=json.dumps(items))
+        if batch is None:
+            job.results = json.dumps([{"filename": item["filename"], "resume_id": None, "data": None, "error": item["error"]} for item in items])
+        db.add(job)
+        await db.commit()
+
+        return JSONResponse(content={
+            "data": job_summary(job),
+            "message": "Accepted",
+            "error": False
+        }, status_code=202)
+
+    except Exception as e:
+        return JSONResponse(content={
+            "data": {},
+            "message": str(e),
+            "error": True
+        }, status_code=error_status(e))
+    finally:
+        for archive in archives:
+            archive.close()
+        await db.close()
+
+@router.get("/resume-review/bulk/{job_id}")
+async def bulk_review_status(job_id: str):
+    db = SessionLocal()
+    try:
+        job = await db.get(ReviewJob, job_id)
+
+        if not job:
+            return JSONResponse(content={
+                "data": {},
+                "message": "Job not found",
+                "error": True
+            }, status_code=404)
+
+        request_counts = None
+        if job.status != "ended":
+            batch = await call_policy.call("bulk", lambda: get_client().messages.batches.retrieve(job.batch_id))
+            request_counts = batch.request_counts.model_dump()
+            if batch.processing_status == "ended":
+                job.results = json.dumps(await collect_results(job.batch_id, json.loads(job.items)))
+                job.status = "ended"
+                job.updated_at = utcnow()
+                await db.commit()
+
+        return JSONResponse(content={
+            "data": job_summary(job, request_counts),
+            "message": "Success",
+            "error": False
+        }, status_code=200)
+
+    except Exception as e:
+        return JSONResponse(content={
+            "data": {},
+            "message": str(e),
+            "error": True
+        }, status_code=error_status(e))
+    finally:
+        await db.close()
@@ -1,97 +1,39 @@
-import os
-from fastapi import APIRouter
-from pydantic import BaseModel
-from dotenv import load_dotenv
-from anthropic import Anthropic
-from sqlalchemy.orm import sessionmaker
+import base64, asyncio, logging
+from functools import lru_cache
+from datetime import datetime
+from pydantic import BaseModel, Field
+from fastapi import APIRouter, BackgroundTasks
+from typing import Optional
+from sqlalchemy import update
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import declarative_base
-from .helpers.re_helper import get_formatted_text
-from sqlalchemy import create_engine, Column, Integer, String, JSON
-from contants import MODEL, INTERVEW_AI_TEMPERATURE, INTERVEW_AI_MAX_TOKENS, INTERVIEW_AI_EXAMPLES
+from .helpers.context import fit_history
+from .helpers.llm import cached_system, usage_summary
+from .helpers.scheduler import create_message, stream_message, BACKGROUND
+from .helpers.call_policy import error_status
+from .helpers.sse import sse_event, sse_response, stream_text
+from .helpers.re_helper import extract_tag, TagStripper
+from .helpers.response_cache import response_cache, cache_key, prompt_version
+from .helpers.semantic_cache import semantic_cache
+from .helpers.prompts import load_prompt
+from .database import SessionLocal, Conversation, create_conversation as store_conversation, append_messages, get_messages, list_conversations, search_conversations, match_expression, index_tag, delete_conversation as remove_conversation, message_dict, ConversationNotFound, SEARCH_ENABLED
+from contants import MODEL, INTERVEW_AI_TEMPERATURE, INTERVEW_AI_MAX_TOKENS, INTERVEW_AI_CONTEXT_BUDGET
 
-load_dotenv()
 router = APIRouter()
-client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+logger = logging.getLogger(__name__)
 
-# Database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./chat.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine)
+@lru_cache(maxsize=None)
+def chat_system():
+    # instructions and few-shot examples form one cacheable prefix ahead of the conversation
+    return cached_system(load_prompt("chat_system"), load_prompt("chat_examples"))
 
-Base = declarative_base()
-
-# Database Model
-class ChatMessage(Base):
-    __tablename__ = "messages"
-    
-    conversation_id = Column(Integer, primary_key=True, index=True)
-    tag = Column(String)
-    messages = Column(JSON)  # Stores list of message dictionaries
-
-Base.metadata.create_all(bind=engine)
-
-SYSTEM_MESSAGE = """
-You are an AI assistant designed to help candidates prepare for job interviews. Your task is to provide helpful, ethical, and relevant responses to interview preparation prompts. Follow these instructions carefully:
-
-1. Read the interview preparation prompt.
-
-2. Analyze the prompt to determine the specific area of interview preparation being addressed (e.g., common questions, industry-specific knowledge, behavioral scenarios, technical skills).
-
-3. Generate a response that addresses the prompt comprehensively. Your response should:
-    a. Be relevant to the specific interview preparation topic
-    b. Provide practical advice and examples
-    c. Encourage authentic responses and continuous learning
-    d. Support ethical interview practices
-
-4. Format your response in Markdown, using appropriate headings, subheadings, bullet points, and line breaks. Ensure proper spacing between content and headings.
-
-5. Include the following sections in your response, as applicable:
-    - Overview of the topic
-    - Key points to remember
-    - Sample answers or approaches
-    - Tips for improvement
-    - Common mistakes to avoid
-
-6. If the prompt is unclear or lacks sufficient information, ask for clarification before providing a full response.
-
-7. Adhere to these ethical guidelines:
-    - Do not provide or encourage company-specific information that isn't publicly available
-    - Avoid answers that promote dishonesty or exaggeration
-    - Don't suggest shortcuts that compromise learning
-    - Refrain from promoting harmful or discriminatory practices
-
-8. Respond only to prompts related to job interview preparation. For unrelated prompts, reply with guidelines such as: 'Please provide your request in the context of job interview preparation for assistance.'
-
-9. Do not repeat or echo the original prompt in your response.
-
-10. Ensure all line breaks are escaped with "\n" and special characters within strings are properly escaped with a backslash ("\").
-
-11. Enclose your entire response within <answer> ... </answer> tags even if the prompt is unrelated to the  job interview. Ensure every response begins with the <answer> tag and ends with the </answer> tag.
-
-12. Manage the response length appropriately, ensuring it is comprehensive yet concise.
-
-13. Don't use line break at the start and end of the response.
-
-Remember, your goal is to help candidates excel in their job interview by providing valuable, ethical, and well-structured advice.
-"""
-
-TAG_SYSTEM_MESSAGE = """
-You are tasked with assigning a short tag to a newly created conversation based on the first prompt. This tag will be displayed on the left side drawer of the chat interface, similar to how Claude AI or ChatGPT organizes conversations.
-
-Guidelines for creating tags:
-- Keep the tag concise, ideally 4-6 words
-- Tag should be relevant to the prompt
-- Make it descriptive of the main topic or intent of the prompt
-- Use lowercase letters
-- Avoid using special characters or punctuation
-- Just return a single line tag in String format.
-
-Analyze the prompt to determine its main topic, intent, or key theme. Then, generate a short tag that best represents the conversation based on this first prompt. 
-"""
+def semantic_version():
+    # answers in the near-duplicate index are only valid for this model and prompt; set before the index is loaded
+    return prompt_version([MODEL, INTERVEW_AI_TEMPERATURE, chat_system()])
 
 class ConversationRequest(BaseModel):
     prompt: str
+    defer_tag: bool = False  # return the answer first and fill in the tag from a background task
+    no_cache: bool = False  # skip the response cache and generate a fresh answer
 
 class UpdateConversationRequest(BaseModel):
     conversation_id: int
@@ -99,72 +41,146 @@ class UpdateConversationRequest(BaseModel):
 
 class GetConversationRequest(BaseModel):
     conversation_id: int
+    after_seq: Optional[int] = Field(None, ge=-1)  # page cursor: only messages after this seq
+    limit: Optional[int] = Field(None, ge=1, le=100)  # page size; all remaining messages when omitted
+
+class ListConversationsRequest(BaseModel):
+    limit: int = Field(20, ge=1, le=100)
+    cursor: Optional[str] = None  # next_cursor from the previous page
+
+class SearchConversationsRequest(BaseModel):
+    query: str
+    limit: int = Field(20, ge=1, le=50)
 
 class DeleteConversationRequest(BaseModel):
     conversation_id: int
 
-@router.post("/create-conversation")
-async def create_conversation(request: ConversationRequest):
-    try:
-        tag_response = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=200,
-            temperature=0.3,
-            system=TAG_SYSTEM_MESSAGE,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "<examples>\n<example>\n<FIRST_PROMPT>\nHi, I am interviewing for a Unity Developer position at Rockstar. Do you have any recommendations for me?\n</FIRST_PROMPT>\n<ideal_output>\n<suggested_tag>\nunity dev rockstar interview prep\n</suggested_tag>\n</ideal_output>\n</example>\n</examples>\n\n"
-                        },
-                        {
-                            "type": "text",
-                            "text": f"<first_prompt>\n{request.prompt}\n</first_prompt>"
-                        }
-                    ]
-                }
-            ]
-        )
-        
-        tag = tag_response.content[0].text.strip()
-        
-        chat_response = client.messages.create(
-            model=MODEL,
-            max_tokens=INTERVEW_AI_MAX_TOKENS,
-            temperature=INTERVEW_AI_TEMPERATURE,
-            system=SYSTEM_MESSAGE,
-            messages=[
+def chat_messages(existing_messages, prompt):
+    # the examples live in chat_system(), so only the (budgeted) history and the new prompt follow the cached prefix
+    return [
+        *fit_history(existing_messages, INTERVEW_AI_CONTEXT_BUDGET),
+        {
+            "role": "user",
+            "content": [
                 {
-                    "role": "user",
-                    "content": [
-                        INTERVIEW_AI_EXAMPLES,
-                        {
-                            "type": "text",
-                            "text": f"<interview_prompt>\n{request.prompt}\n</interview_prompt>"
-                        }
-                    ]
+                    "type": "text",
+                    "text": f"<interview_prompt>\n{prompt}\n</interview_prompt>"
                 }
             ]
-        )
+        }
+    ]
+
+def encode_cursor(updated_at, conversation_id):
+    return base64.urlsafe_b64encode(f"{updated_at.isoformat()}|{conversation_id}".encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        updated_at, conversation_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(updated_at), int(conversation_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+async def generate_tag(prompt, priority=None):
+    tag_response = await create_message(
+        "tag",
+        priority,
+        model="claude-3-5-sonnet-20241022",
+        max_tokens=200,
+        temperature=0.3,
+        system=load_prompt("tag_system"),
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": load_prompt("tag_examples")
+                    },
+                    {
+                        "type": "text",
+                        "text": f"<first_prompt>\n{prompt}\n</first_prompt>"
+                    }
+                ]
+            }
+        ]
+    )
+    
+    return tag_response.content[0].text.strip(), tag_response.usage
+
+async def tag_conversation(conversation_id, prompt):
+    # background task for deferred tagging; the conversation keeps a null tag if this fails
+    db = SessionLocal()
+    try:
+        tag, _ = await generate_tag(prompt, BACKGROUND)
+        await db.execute(update(Conversation).where(Conversation.conversation_id == conversation_id).values(tag=tag))
+        await index_tag(db, conversation_id, tag)
+        await db.commit()
+    except Exception:
+        logger.exception("Deferred tagging failed for conversation %s", conversation_id)
+    finally:
+        await db.close()
+
+async def gather_or_cancel(*calls):
+    # like asyncio.gather, but when one call fails (or the request is cancelled) the others are cancelled
+    # instead of running on unobserved and holding their scheduler slots
+    tasks = [asyncio.ensure_future(call) for call in calls]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@router.post("/create-conversation")
+async def create_conversation(request: ConversationRequest, background_tasks: BackgroundTasks):
+    db = SessionLocal()
+    try:
+        # a first prompt has no history, so repeats of the same opener can share one answer (and tag)
+        key = cache_key("create-conversation", MODEL, INTERVEW_AI_TEMPERATURE, chat_system(), prompt=request.prompt)
+        cached = await response_cache.get(key, bypass=request.no_cache)
+        if cached is None and not request.no_cache:
+            # otherwise reuse the answer to a reworded version of the same question
+            cached, _ = semantic_cache.lookup(request.prompt)
         
-        # remove the XML tags from the response
-        formatted_text = get_formatted_text(chat_response.content[0].text, r"<answer>(.*?)</answer>")
+        if cached is not None:
+            formatted_text, tag, usages = cached["answer"], cached["tag"], []
+            if tag is None and not request.defer_tag:
+                tag, tag_usage = await generate_tag(request.prompt)
+                usages.append(tag_usage)
+        else:
+            chat_request = create_message(
+                "chat",
+                model=MODEL,
+                max_tokens=INTERVEW_AI_MAX_TOKENS,
+                temperature=INTERVEW_AI_TEMPERATURE,
+                system=chat_system(),
+                messages=chat_messages([], request.prompt)
+            )
+            
+            if request.defer_tag:
+                tag, tag_usage = None, None
+                chat_response = await chat_request
+            else:
+                # the tag and the answer are independent, so issue both round trips at once
+                (tag, tag_usage), chat_response = await gather_or_cancel(generate_tag(request.prompt), chat_request)
+            
+            # remove the XML tags from the response
+            formatted_text = extract_tag(chat_response.content[0].text, "answer")
+            usages = [chat_response.usage, tag_usage]
+            await response_cache.set(key, {"answer": formatted_text, "tag": tag})
+            semantic_cache.add(request.prompt, {"answer": formatted_text, "tag": tag})
         
         messages = [
             {"role": "user", "content": request.prompt},
             {"role": "assistant", "content": formatted_text}
         ]
         
-        db = SessionLocal()
-        db_message = ChatMessage(tag=tag, messages=messages)
-        db.add(db_message)
-        db.commit()
-        db.refresh(db_message)
+        conversation = await store_conversation(db, tag, messages)
+        
+        if tag is None:
+            background_tasks.add_task(tag_conversation, conversation.conversation_id, request.prompt)
         
         data = {
-            "conversation_id": db_message.conversation_id,
+            "conversation_id": conversation.conversation_id,
             "tag": tag,
             "messages": messages,
         }
@@ -172,7 +188,9 @@ async def create_conversation(request: ConversationRequest):
         return JSONResponse(content={
             "data": data,
             "message": "Success",
-            "error": False
+            "error": False,
+            "usage": usage_summary(*usages),
+            "cached": cached is not None
         }, status_code=200)
         
     except Exception as e:
@@ -180,15 +198,15 @@ async def create_conversation(request: ConversationRequest):
             "data": {},
             "message": str(e),
             "error": True
-        })
+        }, status_code=error_status(e))
     finally:
-        db.close()
+        await db.close()
 
 @router.put("/update-conversation")
 async def update_conversation(request: UpdateConversationRequest):
+    db = SessionLocal()
     try:
-        db = SessionLocal()
-        conversation = db.query(ChatMessage).filter(ChatMessage.conversation_id == request.conversation_id).first()
+        conversation = await db.get(Conversation, request.conversation_id)
         
         if not conversation:
             return JSONResponse(content={
@@ -198,61 +216,148 @@ async def update_conversation(request: UpdateConversationRequest):
             }, status_code=404)
         
         
-        existing_messages = conversation.messages # get all messages
+        existing_messages = [message_dict(message) for message in await get_messages(db, request.conversation_id)] # get all messages
+        await db.commit()  # release the pooled connection while the model generates
         
-        chat_response = client.messages.create(
+        chat_response = await create_message(
+            "chat",
             model=MODEL,
             max_tokens=INTERVEW_AI_MAX_TOKENS,
             temperature=INTERVEW_AI_TEMPERATURE,
-            system=SYSTEM_MESSAGE,
-            messages=[
-                *existing_messages,
-                {
-                    "role": "user",
-                    "content": [
-                        INTERVIEW_AI_EXAMPLES,
-                        {
-                            "type": "text",
-                            "text": f"<interview_prompt>\n{request.prompt}\n</interview_prompt>"
-                        }
-                    ]
-                }
-            ]
+            system=chat_system(),
+            messages=chat_messages(existing_messages, request.prompt)
         )
         
         # remove the XML tags from the response
-        formatted_text = get_formatted_text(chat_response.content[0].text, r"<answer>(.*?)</answer>")
+        formatted_text = extract_tag(chat_response.content[0].text, "answer")
         
-        # Add new messages to existing conversation
-        new_messages = existing_messages + [
+        # Append the new turn; earlier messages are never rewritten
+        await append_messages(db, request.conversation_id, [
             {"role": "user", "content": request.prompt},
             {"role": "assistant", "content": formatted_text}
-        ]
-        
-        conversation.messages = new_messages
-        db.commit()
-        db.refresh(conversation)
+        ])
         
         return JSONResponse(content={
             "data": formatted_text,
             "message": "Success",
-            "error": False
+            "error": False,
+            "usage": usage_summary(chat_response.usage)
         }, status_code=200)
         
+    except ConversationNotFound as e:
+        return JSONResponse(content={
+            "data": {},
+            "message": str(e),
+            "error": True
+        }, status_code=404)
     except Exception as e:
         return JSONResponse(content={
             "data": "",
             "message": str(e),
             "error": True
-        }, status_code=500)
+        }, status_code=error_status(e))
     finally:
-        db.close()
+        await db.close()
     
+def stream_chat(messages):
+    return stream_message(
+        "chat",
+        model=MODEL,
+        max_tokens=INTERVEW_AI_MAX_TOKENS,
+        temperature=INTERVEW_AI_TEMPERATURE,
+        system=chat_system(),
+        messages=messages
+    )
+
+@router.post("/create-conversation/stream")
+async def create_conversation_stream(request: ConversationRequest, background_tasks: BackgroundTasks):
+    # Same as /create-conversation, but the answer is sent as SSE "delta" events while it is generated.
+    # The conversation is stored once the stream completes and a final "done" event carries the usual payload.
+    async def events():
+        tag_task = None if request.defer_tag else asyncio.create_task(generate_tag(request.prompt))
+        stripper = TagStripper("answer")
+        usages = []
+        try:
+            async for event in stream_text(stream_chat(chat_messages([], request.prompt)), stripper, usages):
+                yield event
+            
+            tag, tag_usage = await tag_task if tag_task else (None, None)
+            messages = [
+                {"role": "user", "content": request.prompt},
+                {"role": "assistant", "content": stripper.text}
+            ]
+            
+            db = SessionLocal()
+            try:
+                conversation_id = (await store_conversation(db, tag, messages)).conversation_id
+            finally:
+                await db.close()
+            
+            if request.defer_tag:
+                background_tasks.add_task(tag_conversation, conversation_id, request.prompt)
+            
+            yield sse_event("done", {
+                "data": {
+                    "conversation_id": conversation_id,
+                    "tag": tag,
+                    "messages": messages,
+                },
+                "message": "Success",
+                "error": False,
+                "usage": usage_summary(*usages, tag_usage)
+            })
+        except Exception as e:
+            yield sse_event("error", {"data": {}, "message": str(e), "error": True})
+        finally:
+            if tag_task and not tag_task.done():
+                tag_task.cancel()
+    
+    return sse_response(events())
+
+@router.put("/update-conversation/stream")
+async def update_conversation_stream(request: UpdateConversationRequest):
+    db = SessionLocal()
+    try:
+        conversation = await db.get(Conversation, request.conversation_id)
+        
+        if not conversation:
+            return JSONResponse(content={
+                "data": {},
+                "message": "Conversation not found",
+                "error": True
+            }, status_code=404)
+        
+        existing_messages = [message_dict(message) for message in await get_messages(db, request.conversation_id)]
+    finally:
+        await db.close()
+    
+    async def events():
+        stripper = TagStripper("answer")
+        usages = []
+        try:
+            async for event in stream_text(stream_chat(chat_messages(existing_messages, request.prompt)), stripper, usages):
+                yield event
+            
+            db = SessionLocal()
+            try:
+                await append_messages(db, request.conversation_id, [
+                    {"role": "user", "content": request.prompt},
+                    {"role": "assistant", "content": stripper.text}
+                ])
+            finally:
+                await db.close()
+            
+            yield sse_event("done", {"data": stripper.text, "message": "Success", "error": False, "usage": usage_summary(*usages)})
+        except Exception as e:
+            yield sse_event("error", {"data": "", "message": str(e), "error": True})
+    
+    return sse_response(events())
+
 @router.post("/get-conversation")
 async def get_conversation(request: GetConversationRequest):
+    db = SessionLocal()
     try: 
-        db = SessionLocal()
-        conversation = db.query(ChatMessage).filter(ChatMessage.conversation_id == request.conversation_id).first()
+        conversation = await db.get(Conversation, request.conversation_id)
         
         if not conversation:
             return JSONResponse(content={
@@ -261,11 +366,17 @@ async def get_conversation(request: GetConversationRequest):
             "error": True
         }, status_code=404)
         
+        # fetch one extra row to know whether another page follows
+        messages = await get_messages(db, request.conversation_id, request.after_seq, request.limit + 1 if request.limit else None)
+        has_more = request.limit is not None and len(messages) > request.limit
+        messages = messages[:request.limit] if request.limit else messages
+        
         return JSONResponse(content={
             "data": {
                 "conversation_id": conversation.conversation_id,
                 "tag": conversation.tag,
-                "messages": conversation.messages
+                "messages": [message_dict(message) for message in messages],
+                "next_after_seq": messages[-1].seq if has_more else None
             },
             "message": "Success",
             "error": False
@@ -277,13 +388,101 @@ async def get_conversation(request: GetConversationRequest):
             "error": True
         }, status_code=500)
     finally:
-        db.close()
+        await db.close()
         
+@router.post("/conversations")
+async def get_conversations(request: ListConversationsRequest):
+    # sidebar listing, most recently updated first; message bodies are never loaded
+    db = SessionLocal()
+    try:
+        try:
+            before = decode_cursor(request.cursor) if request.cursor else None
+        except ValueError as e:
+            return JSONResponse(content={
+                "data": [],
+                "message": str(e),
+                "error": True
+            }, status_code=400)
+        
+        # fetch one extra row to know whether another page follows
+        rows = await list_conversations(db, request.limit + 1, before)
+        has_more = len(rows) > request.limit
+        rows = rows[:request.limit]
+        
+        return JSONResponse(content={
+            "data": [
+                {
+                    "conversation_id": row.conversation_id,
+                    "tag": row.tag,
+                    "message_count": row.message_count,
+                    "updated_at": row.updated_at.isoformat()
+                }
+                for row in rows
+            ],
+            "next_cursor": encode_cursor(rows[-1].updated_at, rows[-1].conversation_id) if has_more else None,
+            "message": "Success",
+            "error": False
+        }, status_code=200)
+    except Exception as e:
+        return JSONResponse(content={
+            "data": [],
+            "message": str(e),
+            "error": True
+        }, status_code=500)
+    finally:
+        await db.close()
+
+@router.post("/search-conversations")
+async def search(request: SearchConversationsRequest):
+    # ranked full-text matches over tags and messages, one result (the best snippet) per conversation
+    if not SEARCH_ENABLED:
+        return JSONResponse(content={
+            "data": [],
+            "message": "Search requires the SQLite database",
+            "error": True
+        }, status_code=501)
+    
+    query = match_expression(request.query)
+    if query is None:
+        return JSONResponse(content={
+            "data": [],
+            "message": "Search query has no words",
+            "error": True
+        }, status_code=400)
+    
+    db = SessionLocal()
+    try:
+        rows = await search_conversations(db, query, request.limit)
+        
+        return JSONResponse(content={
+            "data": [
+                {
+                    "conversation_id": row.conversation_id,
+                    "tag": row.tag,
+                    "updated_at": row.updated_at.isoformat(),
+                    "seq": row.seq,  # matching message, or None when the tag matched
+                    "snippet": row.snippet,
+                    "score": row.score
+                }
+                for row in rows
+            ],
+            "message": "Success",
+            "error": False
+        }, status_code=200)
+    except Exception as e:
+        return JSONResponse(content={
+            "data": [],
+            "message": str(e),
+            "error": True
+        }, status_code=500)
+    finally:
+        await db.close()
+
 @router.delete("/delete-conversation")
 async def delete_conversation(request: DeleteConversationRequest):
+    db = SessionLocal()
     try:
-        db = SessionLocal()
-        conversation = db.query(ChatMessage).filter(ChatMessage.conversation_id == request.conversation_id).first()
+        conversation = await db.get(Conversation, request.conversation_id)
         
         if not conversation:
             return JSONResponse(content={
@@ -292,8 +491,7 @@ async def delete_conversation(request: DeleteConversationRequest):
                 "error": True
             }, status_code=404)
         
-        db.delete(conversation)
-        db.commit()
+        await remove_conversation(db, request.conversation_id)
         
         return JSONResponse(content={
             "data": {
@@ -311,4 +509,4 @@ async def delete_conversation(request: DeleteConversationRequest):
             "error": True
         }, status_code=500)
     finally:
-        db.close()
\ No newline at end of file
+        await db.close()
\ No newline at end of file
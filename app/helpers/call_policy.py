@@ -0,0 +1,170 @@
+import os, time, random, asyncio
+
+# How upstream LLM calls ride out transient failures: every call has a per-endpoint deadline, retryable
+# errors (overloaded, rate limited, 5xx, connection drops) are retried with full-jitter exponential backoff,
+# interactive chat can hedge a slow request with a second copy, and a circuit breaker fails fast while
+# the upstream is down instead of queueing every request behind doomed retries. The SDK's own retries
+# are turned off (see llm.get_client) so attempts aren't multiplied.
+LLM_RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "3"))  # including the first
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))  # seconds
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "0"))  # seconds before chat sends a hedge; 0 disables
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))  # consecutive failures that open the circuit
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))  # seconds before a trial call is let through
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+class Policy:
+    def __init__(self, deadline, attempts=LLM_RETRY_ATTEMPTS, hedge_after=0.0):
+        self.deadline = deadline  # seconds for the whole call, retries included
+        self.attempts = attempts
+        self.hedge_after = hedge_after
+
+POLICIES = {
+    "chat": Policy(float(os.getenv("LLM_DEADLINE_CHAT", "45")), hedge_after=LLM_HEDGE_AFTER),
+    "tag": Policy(float(os.getenv("LLM_DEADLINE_TAG", "15"))),
+    "cover_letter": Policy(float(os.getenv("LLM_DEADLINE_COVER_LETTER", "90"))),
+    "resume_review": Policy(float(os.getenv("LLM_DEADLINE_RESUME_REVIEW", "90"))),
+    "bulk": Policy(float(os.getenv("LLM_DEADLINE_BULK", "60"))),
+}
+DEFAULT_POLICY = Policy(60.0)
+
+class UpstreamError(Exception):
+    # raised when the policy gives up; routes answer with status_code
+    status_code = 503
+
+class CircuitOpen(UpstreamError):
+    pass
+
+class DeadlineExceeded(UpstreamError):
+    status_code = 504
+
+class CircuitBreaker:
+    # closed -> open after threshold consecutive failures -> one trial call per cooldown -> closed on success
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.reset()
+
+    def reset(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_at = None
+
+    def check(self):
+        if self.opened_at is None:
+            return
+        now = time.monotonic()
+        if now - self.opened_at < self.cooldown or (self.trial_at is not None and now - self.trial_at < self.cooldown):
+            raise CircuitOpen("The AI service is unavailable right now; please try again shortly")
+        self.trial_at = now
+
+    def success(self):
+        self.reset()
+
+    def failure(self):
+        self.failures += 1
+        self.trial_at = None
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self.opened_at < self.cooldown else "half_open"
+
+breaker = CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN)
+counters = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "deadline_exceeded": 0, "circuit_rejections": 0}
+
+def retryable(error):
+    # APITimeoutError is an APIConnectionError. The SDK is imported here rather than at module level so the
+    # app starts without it; by the time an upstream error exists the client has loaded it anyway.
+    import anthropic
+
+    if isinstance(error, anthropic.APIConnectionError):
+        return True
+    return isinstance(error, anthropic.APIStatusError) and error.status_code in RETRYABLE_STATUS
+
+def backoff(attempt, error):
+    # the upstream's retry-after when it sends one, otherwise full jitter so retries don't arrive in waves
+    import anthropic
+
+    if isinstance(error, anthropic.APIStatusError):
+        try:
+            return min(float(error.response.headers.get("retry-after")), LLM_RETRY_MAX_DELAY)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+
+def error_status(error):
+    # HTTP status for a route's catch-all: 503/504 when the upstream is at fault, 500 otherwise
+    if isinstance(error, UpstreamError):
+        return error.status_code
+    return 503 if retryable(error) else 500
+
+async def hedged(request, after):
+    # sends a second copy if the first hasn't answered after `after` seconds; the first success wins
+    first = asyncio.ensure_future(request())
+    pending = {first}
+    error = None
+    try:
+        # inside the try so a deadline or a cancelled caller also cancels the attempt still in flight
+        done, _ = await asyncio.wait(pending, timeout=after)
+        if done:
+            return first.result()
+
+        counters["hedges"] += 1
+        second = asyncio.ensure_future(request())
+        pending = {first, second}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        counters["hedge_wins"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def call(endpoint, request, hedge=True):
+    # request() starts one attempt and returns its awaitable; it is called again for every retry or hedge
+    policy = POLICIES.get(endpoint, DEFAULT_POLICY)
+    deadline = time.monotonic() + policy.deadline
+    counters["calls"] += 1
+
+    for attempt in range(policy.attempts):
+        try:
+            breaker.check()
+        except CircuitOpen:
+            counters["circuit_rejections"] += 1
+            raise
+
+        try:
+            async with asyncio.timeout(deadline - time.monotonic()):
+                if hedge and policy.hedge_after:
+                    result = await hedged(request, policy.hedge_after)
+                else:
+                    result = await request()
+        except TimeoutError:
+            breaker.failure()
+            counters["deadline_exceeded"] += 1
+            raise DeadlineExceeded(f"The AI service didn't answer within {policy.deadline:.0f}s")
+        except Exception as error:
+            if not retryable(error):
+                breaker.success()  # the upstream answered; the request itself was bad
+                raise
+            breaker.failure()
+            delay = backoff(attempt, error)
+            if attempt == policy.attempts - 1 or time.monotonic() + delay >= deadline:
+                raise
+            counters["retries"] += 1
+            await asyncio.sleep(delay)
+        else:
+            breaker.success()
+            return result
+
+def stats():
+    return {**counters, "circuit": breaker.state(), "consecutive_failures": breaker.failures}
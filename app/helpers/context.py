@@ -0,0 +1,67 @@
+# Keeps the conversation history sent with each chat turn inside a token budget. The system prompt and
+# examples are a fixed, cached prefix, so only the history grows; once it approaches the budget the oldest
+# turns are dropped and replaced by a short summary of what the candidate asked, which keeps per-turn
+# cost flat no matter how long the conversation gets.
+
+CHARS_PER_TOKEN = 4
+SUMMARY_PROMPT_CHARS = 160  # each dropped prompt is cut to this length in the summary
+
+def estimate_tokens(content):
+    # cheap local estimate; avoids a count_tokens round trip on every turn
+    if isinstance(content, list):
+        return sum(estimate_tokens(block.get("text", "")) for block in content)
+    return len(content) // CHARS_PER_TOKEN + 1
+
+def message_text(message):
+    content = message["content"]
+    if isinstance(content, list):
+        return " ".join(block.get("text", "") for block in content)
+    return content
+
+def summarize_turns(dropped, budget):
+    # extractive summary: the most recent dropped prompts that fit in a tenth of the budget
+    lines = []
+    remaining = max(budget // 10, 1)
+    for message in reversed(dropped):
+        if message["role"] != "user":
+            continue
+        prompt = " ".join(message_text(message).split())
+        if len(prompt) > SUMMARY_PROMPT_CHARS:
+            prompt = prompt[:SUMMARY_PROMPT_CHARS].rstrip() + "..."
+        cost = estimate_tokens(prompt)
+        if cost > remaining:
+            break
+        lines.insert(0, f"- {prompt}")
+        remaining -= cost
+
+    omitted = sum(1 for message in dropped if message["role"] == "user") - len(lines)
+    if omitted > 0:
+        lines.insert(0, f"- ({omitted} earlier questions omitted)")
+
+    return "<conversation_summary>\nEarlier in this conversation the candidate asked about:\n" + "\n".join(lines) + "\n</conversation_summary>"
+
+def fit_history(messages, budget, min_turns=1):
+    # messages alternate user/assistant starting with user; whole turns are dropped from the front
+    # until the rest fits in budget, but the newest min_turns (at least one) turns are always kept
+    turns = [messages[i:i + 2] for i in range(0, len(messages), 2)]
+    costs = [sum(estimate_tokens(message["content"]) for message in turn) for turn in turns]
+
+    if sum(costs) <= budget:
+        return list(messages)
+
+    # once trimming starts, a tenth of the budget is reserved for the summary
+    total = sum(costs)
+    start = 0
+    while total > budget - budget // 10 and len(turns) - start > max(min_turns, 1):
+        total -= costs[start]
+        start += 1
+
+    dropped = [message for turn in turns[:start] for message in turn]
+    kept = [message for turn in turns[start:] for message in turn]
+
+    # fold the summary into the first kept user message so roles keep alternating
+    first = kept[0]
+    content = first["content"] if isinstance(first["content"], list) else [{"type": "text", "text": first["content"]}]
+    kept[0] = {"role": first["role"], "content": [{"type": "text", "text": summarize_turns(dropped, budget)}, *content]}
+
+    return kept
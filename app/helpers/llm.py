@@ -0,0 +1,82 @@
+import os, asyncio
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Connection pool shared by every router in this process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+# "anthropic" calls the real API; "stub" answers every call from the canned stub in this process (offline tests and benchmarks)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "anthropic")
+
+_client = None
+_client_loop = None
+
+def get_client():
+    # One pooled AsyncAnthropic client per event loop. Under uvicorn that is one per worker
+    # process; the loop check only matters for TestClient, which spins up a fresh loop per request.
+    global _client, _client_loop
+
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        if LLM_BACKEND == "stub":
+            _client = stub_client()
+        else:
+            # the SDK (and httpx under it) is imported with the first client rather than with the app
+            import httpx
+            from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+
+            _client = AsyncAnthropic(
+                api_key=os.getenv("ANTHROPIC_API_KEY"),
+                max_retries=0,  # retries, deadlines and backoff belong to call_policy
+                http_client=DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    )
+                ),
+            )
+        _client_loop = loop
+    return _client
+
+def stub_client():
+    # the same SDK client, so routers, retries and stream parsing run unchanged; only the transport is swapped
+    from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+    from .stub_llm import stub_app, InProcessTransport
+    return AsyncAnthropic(
+        api_key="stub",
+        base_url="http://stub-llm",
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(transport=InProcessTransport(stub_app)),
+    )
+
+async def close_client():
+    global _client, _client_loop
+
+    if _client is not None:
+        await _client.close()
+    _client = None
+    _client_loop = None
+
+def cached_system(*texts):
+    # System prompt as text blocks with a cache breakpoint on the last one, so the static prefix
+    # (instructions + few-shot examples) is written to the prompt cache once and read back afterwards.
+    blocks = [{"type": "text", "text": text} for text in texts]
+    blocks[-1]["cache_control"] = {"type": "ephemeral"}
+    return blocks
+
+def usage_summary(*usages):
+    # token counts summed over every LLM call a request made; cache_read_input_tokens are prompt cache hits,
+    # cache_creation_input_tokens are misses that were written to the cache
+    summary = {
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cache_read_input_tokens": 0,
+        "cache_creation_input_tokens": 0,
+    }
+    for usage in usages:
+        if usage is None:
+            continue
+        for key in summary:
+            summary[key] += getattr(usage, key, None) or 0
+    return summary
@@ -0,0 +1,112 @@
+import time, contextvars
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Per-request instrumentation without a metrics dependency. Stage timings (PDF extraction, scheduler queueing,
+# every LLM call, SQLite commits) are added up for the current request and sent back as a Server-Timing header
+# by the middleware in main.py; the same timings, request durations, LLM token usage and estimated cost are
+# kept per process and rendered in the Prometheus text format at /metrics.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)  # seconds
+
+# USD per million tokens: input, output, cache write, cache read; matched by model name prefix
+PRICES = {
+    "claude-3-5-sonnet": (3.0, 15.0, 3.75, 0.30),
+    "claude-3-5-haiku": (0.80, 4.0, 1.0, 0.08),
+    "claude-3-opus": (15.0, 75.0, 18.75, 1.50),
+    "claude-3-haiku": (0.25, 1.25, 0.30, 0.03),
+}
+
+current_timings = contextvars.ContextVar("current_timings", default=None)  # stage -> seconds for the request being served
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def label_text(pairs):
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = defaultdict(float)
+
+    def inc(self, amount=1.0, **labels):
+        self.values[tuple(labels[name] for name in self.labels)] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{label_text(list(zip(self.labels, key)))} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}  # label values -> [per-bucket counts (the last one is +Inf), sum]
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        series = self.series.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(self.series.items()):
+            pairs = list(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{label_text(pairs + [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{label_text(pairs)} {total}")
+            lines.append(f"{self.name}_count{label_text(pairs)} {cumulative}")
+        return lines
+
+request_seconds = Histogram("interviewgpt_request_duration_seconds", "Time until the response headers were sent", ("method", "route", "status"))
+stage_seconds = Histogram("interviewgpt_stage_duration_seconds", "Time spent in one stage of a request", ("stage",))
+llm_tokens = Counter("interviewgpt_llm_tokens_total", "LLM tokens by endpoint, model and kind", ("endpoint", "model", "kind"))
+llm_cost = Counter("interviewgpt_llm_cost_usd_total", "Estimated LLM spend in USD", ("endpoint", "model"))
+tag_extractions = Counter("interviewgpt_tag_extractions_total", "Tag extractions from LLM replies by outcome (matched, unterminated, missing)", ("tag", "outcome"))
+
+METRICS = [request_seconds, stage_seconds, llm_tokens, llm_cost, tag_extractions]
+
+def record_stage(name, seconds):
+    stage_seconds.observe(seconds, stage=name)
+    timings = current_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+def record_usage(endpoint, model, usage):
+    counts = {
+        "input": usage.input_tokens or 0,
+        "output": usage.output_tokens or 0,
+        "cache_write": getattr(usage, "cache_creation_input_tokens", None) or 0,
+        "cache_read": getattr(usage, "cache_read_input_tokens", None) or 0,
+    }
+    for kind, count in counts.items():
+        if count:
+            llm_tokens.inc(count, endpoint=endpoint, model=model, kind=kind)
+
+    prices = next((prices for prefix, prices in PRICES.items() if model.startswith(prefix)), None)
+    if prices:
+        llm_cost.inc(sum(count * price for count, price in zip(counts.values(), prices)) / 1_000_000, endpoint=endpoint, model=model)
+
+def server_timing(timings):
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+def render():
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
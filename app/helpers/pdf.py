@@ -0,0 +1,132 @@
+import io, os, time, asyncio, logging, multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# PyMuPDF is CPU bound and not thread safe, so text extraction runs in a small process pool
+# instead of on the event loop. Limits are checked before any page is parsed.
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(5 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "10"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(os.cpu_count() or 1, 4))))
+
+# Scanned pages (images with no text layer) are rasterized and run through Tesseract. OCR gets its own
+# small pool, a per-request page cap and a time budget so a stack of scans can't starve text extraction.
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "3"))
+OCR_TIME_BUDGET = float(os.getenv("OCR_TIME_BUDGET", "20"))  # seconds per request
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+OCR_DPI = 200
+OCR_MIN_CHARS = 20  # pages with less text than this that contain images are treated as scans
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_ocr_pool = None
+_slots = None
+_slots_loop = None
+
+class PDFError(ValueError):
+    # the upload is not a PDF we are willing to parse; routes answer 400 with the message
+    pass
+
+def check_size(size):
+    if size is not None and size > PDF_MAX_BYTES:
+        raise PDFError(f"PDF is larger than the {PDF_MAX_BYTES // (1024 * 1024)} MB limit")
+
+def extract_pages(source, max_pages, ocr_pages=0):
+    # Runs inside a worker process. source is the PDF bytes or the path of a spooled upload, which
+    # PyMuPDF reads itself. Returns the text of every page plus PNG renders of up to ocr_pages pages
+    # that look scanned, keyed by page index.
+    import fitz
+
+    try:
+        document = fitz.open(source, filetype="pdf") if isinstance(source, str) else fitz.open(stream=source, filetype="pdf")
+    except Exception:
+        raise PDFError("File isn't a valid PDF")
+
+    with document:
+        if document.page_count > max_pages:
+            raise PDFError(f"PDF has {document.page_count} pages; the limit is {max_pages}")
+
+        texts = []
+        scans = {}
+        for page in document:
+            text = page.get_text("text")
+            texts.append(text)
+            if len(scans) < ocr_pages and len(text.strip()) < OCR_MIN_CHARS and page.get_images():
+                scans[page.number] = page.get_pixmap(dpi=OCR_DPI).tobytes("png")
+        return texts, scans
+
+def ocr_image(png_bytes, timeout):
+    # runs on the OCR pool; pytesseract shells out to the tesseract binary and kills it after timeout
+    import pytesseract
+    from PIL import Image
+
+    with Image.open(io.BytesIO(png_bytes)) as image:
+        return pytesseract.image_to_string(image, timeout=timeout)
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        # spawn, not fork: the API process already runs threads (aiosqlite, anyio) that fork would copy mid-lock
+        _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def get_ocr_pool():
+    global _ocr_pool
+    if _ocr_pool is None:
+        _ocr_pool = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+    return _ocr_pool
+
+def get_slots():
+    # caps PDFs queued for the pool so a burst of uploads can't pile up in memory
+    global _slots, _slots_loop
+    loop = asyncio.get_running_loop()
+    if _slots is None or _slots_loop is not loop:
+        _slots = asyncio.Semaphore(PDF_WORKERS * 2)
+        _slots_loop = loop
+    return _slots
+
+async def extract_text(source):
+    # source as for extract_pages; returns (text, elapsed milliseconds including time spent waiting for a worker)
+    if not isinstance(source, str):
+        check_size(len(source))
+    started = time.perf_counter()
+    async with get_slots():
+        texts, scans = await asyncio.get_running_loop().run_in_executor(get_pool(), extract_pages, source, PDF_MAX_PAGES, OCR_MAX_PAGES)
+    if scans:
+        await ocr_pages(texts, scans)
+    return "\n".join(texts), (time.perf_counter() - started) * 1000
+
+async def ocr_pages(texts, scans):
+    # fills texts in place for the scanned pages that finish within the budget; the rest stay as they were
+    loop = asyncio.get_running_loop()
+    futures = {index: loop.run_in_executor(get_ocr_pool(), ocr_image, png_bytes, OCR_TIME_BUDGET) for index, png_bytes in scans.items()}
+    done, pending = await asyncio.wait(futures.values(), timeout=OCR_TIME_BUDGET)
+    for future in pending:
+        future.cancel()
+
+    for index, future in futures.items():
+        if future not in done:
+            logger.warning("OCR of page %s exceeded the %ss budget", index + 1, OCR_TIME_BUDGET)
+        elif future.exception():
+            logger.warning("OCR of page %s failed: %s", index + 1, future.exception())
+        else:
+            texts[index] = future.result()
+
+def worker_ready():
+    # importing fitz is the expensive part, and only the workers need it; the API process never imports it
+    import fitz
+
+    return os.getpid()
+
+async def warm_pool():
+    # start every worker up front so the first uploads don't pay for process spawn + import
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(get_pool(), worker_ready) for _ in range(PDF_WORKERS)))
+
+def shutdown_pool():
+    global _pool, _ocr_pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    if _ocr_pool is not None:
+        _ocr_pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    _ocr_pool = None
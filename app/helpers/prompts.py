@@ -0,0 +1,44 @@
+import os, re
+from functools import lru_cache
+
+# Prompt registry. Every system prompt and few-shot block lives in app/prompts as <name>.v<version>.txt and
+# is read the first time a route asks for it, not when the app is imported. The newest version of each
+# prompt is used unless PROMPT_VERSIONS pins one, e.g. "resume_review_system=1,chat_system=2", so a prompt
+# change ships as a new file and rolling it back is a setting. Response and near-duplicate cache keys hash
+# the prompt text, so switching versions never serves answers written for another one.
+PROMPTS_DIR = os.getenv("PROMPTS_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "prompts"))
+PROMPT_VERSIONS = {
+    name.strip(): int(version)
+    for name, version in (pair.split("=") for pair in os.getenv("PROMPT_VERSIONS", "").split(",") if pair.strip())
+}
+
+FILE_PATTERN = re.compile(r"^(?P<name>\w+)\.v(?P<version>\d+)\.txt$")
+
+class PromptNotFound(LookupError):
+    pass
+
+@lru_cache(maxsize=None)
+def available():
+    # name -> sorted versions on disk
+    versions = {}
+    for filename in os.listdir(PROMPTS_DIR):
+        match = FILE_PATTERN.match(filename)
+        if match:
+            versions.setdefault(match["name"], []).append(int(match["version"]))
+    return {name: sorted(numbers) for name, numbers in versions.items()}
+
+def current_version(name):
+    versions = available().get(name)
+    if not versions:
+        raise PromptNotFound(f"No prompt named {name} in {PROMPTS_DIR}")
+    version = PROMPT_VERSIONS.get(name, versions[-1])
+    if version not in versions:
+        raise PromptNotFound(f"Prompt {name} has no version {version}")
+    return version
+
+@lru_cache(maxsize=None)
+def load_prompt(name, version=None):
+    # the exact file contents; newline="" keeps line endings as written so the cache fingerprints are stable
+    version = current_version(name) if version is None else version
+    with open(os.path.join(PROMPTS_DIR, f"{name}.v{version}.txt"), encoding="utf-8", newline="") as file:
+        return file.read()
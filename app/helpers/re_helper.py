@@ -1,8 +1,117 @@
 import re
+from functools import lru_cache
+from .metrics import tag_extractions
 
-def get_formatted_text(text, pattern):
-    
-    match = re.search(pattern, text, re.DOTALL)
-    if match:
-        return match.group(1)
-    return text
\ No newline at end of file
+# Pulls the text out of <tag>...</tag> wrappers in model replies, whole or as it streams. Replies don't always
+# follow the format: a tag can be missing, left open when max_tokens cuts the reply, repeated, or nested inside
+# itself. Blocks are joined, nested tags are kept as text, an unterminated block keeps what arrived and a reply
+# without the tag is passed through; each outcome is counted so format drift shows up on /metrics.
+
+BLOCK_SEPARATOR = "\n\n"  # between repeated blocks
+
+@lru_cache(maxsize=None)
+def tag_pattern(tag):
+    # compiled once per tag; group 1 is "/" for a closing tag
+    return re.compile(rf"<(/?){re.escape(tag)}>")
+
+class TagStripper:
+    # feed() chunks as they arrive and it returns only the text inside the tag. Besides the text already
+    # emitted it holds at most the preamble (up to max_preamble characters) or a partial tag; if no opening
+    # tag shows up within max_preamble characters the text is passed through unchanged. max_preamble=None
+    # waits for the whole reply, which is what extract_tag does.
+
+    def __init__(self, tag, max_preamble=256):
+        self.tag = tag
+        self.pattern = tag_pattern(tag)
+        self.open_tag = f"<{tag}>"
+        self.close_tag = f"</{tag}>"
+        self.max_preamble = max_preamble
+        self.state = "before"  # before -> inside <-> between, or before -> passthrough
+        self.depth = 0
+        self.blocks = 0
+        self.buffer = ""
+        self.emitted = []
+
+    @property
+    def text(self):
+        # everything emitted so far
+        return "".join(self.emitted)
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        if self.state == "passthrough":
+            output, self.buffer = self.buffer, ""
+            self.emitted.append(output)
+            return output
+
+        output = []
+        position = 0
+        for match in self.pattern.finditer(self.buffer):
+            closing = match.group(1)
+            if self.depth == 0:
+                if closing:
+                    continue  # a stray closing tag outside any block
+                if self.blocks:
+                    output.append(BLOCK_SEPARATOR)
+                self.blocks += 1
+                self.depth = 1
+                self.state = "inside"
+            elif closing:
+                self.depth -= 1
+                output.append(self.buffer[position:match.start() if self.depth == 0 else match.end()])
+                if self.depth == 0:
+                    self.state = "between"
+            else:
+                self.depth += 1
+                output.append(self.buffer[position:match.end()])
+            position = match.end()
+
+        rest = self.buffer[position:]
+        # keep a possible partial tag until the next chunk decides it
+        keep = partial_tag_length(rest, self.open_tag, self.close_tag)
+        if self.state == "inside":
+            output.append(rest[:len(rest) - keep])
+            self.buffer = rest[len(rest) - keep:]
+        elif self.state == "between":
+            self.buffer = rest[len(rest) - keep:]  # text after a block is dropped
+        elif self.max_preamble is not None and len(rest) > self.max_preamble:
+            self.state = "passthrough"
+            output.append(rest)
+            self.buffer = ""
+        else:
+            self.buffer = rest
+
+        output = "".join(output)
+        self.emitted.append(output)
+        return output
+
+    def flush(self):
+        # end of stream: an unterminated tag or a reply without tags keeps its remaining text
+        if self.state == "inside":
+            outcome = "unterminated"
+        elif self.state == "between":
+            outcome = "matched"
+        else:
+            outcome = "missing"
+        tag_extractions.inc(tag=self.tag, outcome=outcome)
+
+        output = "" if self.state == "between" else self.buffer
+        self.buffer = ""
+        self.emitted.append(output)
+        return output
+
+def extract_tag(text, tag):
+    # whole-reply form of TagStripper, e.g. extract_tag(reply, "answer")
+    stripper = TagStripper(tag, max_preamble=None)
+    stripper.feed(text)
+    stripper.flush()
+    return stripper.text
+
+def partial_tag_length(text, open_tag, close_tag):
+    # length of the suffix of text that could still become one of the tags; a partial tag starts at the
+    # last "<" and is shorter than the closing tag, so only that window is looked at
+    index = text.rfind("<", max(len(text) - len(close_tag) + 1, 0))
+    if index == -1:
+        return 0
+    suffix = text[index:]
+    return len(suffix) if open_tag.startswith(suffix) or close_tag.startswith(suffix) else 0
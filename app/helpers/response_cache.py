@@ -0,0 +1,142 @@
+import os, json, time, asyncio, sqlite3, hashlib
+from .cache import TTLCache
+
+# Cache of finished generations for requests whose inputs repeat exactly (after normalization). Keys cover
+# the model, temperature and a hash of the system prompt, so editing a prompt or changing sampling
+# settings never serves a stale answer. RESPONSE_CACHE_BACKEND picks "memory" (per process), "sqlite"
+# (on disk, shared by every worker on the host) or "none". The backends are also used for the resume cache.
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "./response_cache.db")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))  # entries
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(24 * 60 * 60)))  # seconds
+
+def normalize(text):
+    # case and whitespace differences shouldn't produce a different cache entry
+    return " ".join((text or "").split()).casefold()
+
+def prompt_version(system):
+    # short fingerprint of a system prompt (string or cached text blocks)
+    return hashlib.sha256(json.dumps(system, sort_keys=True).encode()).hexdigest()[:16]
+
+def cache_key(endpoint, model, temperature, system, **inputs):
+    payload = {
+        "endpoint": endpoint,
+        "model": model,
+        "temperature": temperature,
+        "prompt_version": prompt_version(system),
+        "inputs": {name: normalize(value) for name, value in inputs.items()},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+class MemoryBackend:
+    def __init__(self, max_entries, ttl):
+        self.cache = TTLCache(max_entries, ttl)
+
+    async def get(self, key):
+        return self.cache.get(key)
+
+    async def set(self, key, value):
+        self.cache.set(key, value)
+
+    def size(self):
+        return len(self.cache.entries)
+
+class SQLiteBackend:
+    # one table of JSON values with an expiry; least recently used rows are evicted past max_entries.
+    # sqlite3 calls run in a thread so the event loop never waits on disk.
+
+    def __init__(self, path, max_entries, ttl, table="response_cache"):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.table = table
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)")
+            connection.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_last_used ON {table} (last_used)")
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _get(self, key):
+        now = time.time()
+        with self.connect() as connection:
+            row = connection.execute(f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+            connection.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+
+    def _set(self, key, value):
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl, now),
+            )
+            connection.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (now,))
+            connection.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    async def get(self, key):
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key, value):
+        await asyncio.to_thread(self._set, key, value)
+
+    def size(self):
+        with self.connect() as connection:
+            return connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+class ResponseCache:
+    def __init__(self, backend, backend_name=RESPONSE_CACHE_BACKEND):
+        self.backend = backend
+        self.backend_name = backend_name
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    async def get(self, key, bypass=False):
+        # bypass skips the lookup (the fresh result is still stored by the caller)
+        if self.backend is None:
+            return None
+        if bypass:
+            self.bypassed += 1
+            return None
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key, value):
+        if self.backend is not None:
+            await self.backend.set(key, value)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend_name,
+            "entries": self.backend.size() if self.backend is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+def make_backend(name=RESPONSE_CACHE_BACKEND, path=RESPONSE_CACHE_PATH, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL, table="response_cache"):
+    if name == "memory":
+        return MemoryBackend(max_entries, ttl)
+    if name == "sqlite":
+        return SQLiteBackend(path, max_entries, ttl, table)
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown cache backend: {name}")
+
+response_cache = ResponseCache(make_backend())
@@ -0,0 +1,61 @@
+import os, asyncio, hashlib
+from .cache import SHARED_STATE_PATH
+from .response_cache import ResponseCache, make_backend
+from .pdf import extract_text, PDFError
+from .metrics import record_stage
+
+# Resume text shared by /resume-review and /cover-letter-generator, keyed by the SHA-256 of the PDF.
+# Uploading the same file twice skips parsing, and the returned resume_id can be sent instead of the file.
+# With several workers RESUME_CACHE_BACKEND=sqlite keeps resume_ids valid whichever worker gets the request.
+RESUME_CACHE_BACKEND = os.getenv("RESUME_CACHE_BACKEND", "memory")
+RESUME_CACHE_SIZE = int(os.getenv("RESUME_CACHE_SIZE", "512"))
+RESUME_CACHE_TTL = int(os.getenv("RESUME_CACHE_TTL", str(60 * 60)))  # seconds
+
+resume_cache = ResponseCache(make_backend(RESUME_CACHE_BACKEND, SHARED_STATE_PATH, RESUME_CACHE_SIZE, RESUME_CACHE_TTL, "resume_cache"), RESUME_CACHE_BACKEND)
+_in_flight = {}  # resume_id -> task, so simultaneous uploads of one file are parsed once
+
+class ResumeNotFound(LookupError):
+    pass
+
+def resume_hash(pdf_bytes):
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+async def ingest_resume(pdf_bytes):
+    # returns (resume_id, text, extraction milliseconds); a cache hit reports 0 ms
+    return await ingest(resume_hash(pdf_bytes), pdf_bytes)
+
+async def ingest(resume_id, source, release=None):
+    # source is what extract_text takes; release() is called once nothing needs the source any more
+    text = await resume_cache.get(resume_id)
+    if text is not None:
+        if release:
+            release()
+        return resume_id, text, 0.0
+
+    task = _in_flight.get(resume_id)
+    if task is None:
+        task = asyncio.ensure_future(extract_text(source))
+        _in_flight[resume_id] = task
+        task.add_done_callback(lambda _: _in_flight.pop(resume_id, None))
+        if release:
+            task.add_done_callback(lambda _: release())
+    elif release:
+        release()
+
+    text, extraction_ms = await asyncio.shield(task)
+    record_stage("pdf", extraction_ms / 1000)
+    await resume_cache.set(resume_id, text)
+    return resume_id, text, extraction_ms
+
+async def load_resume(upload, resume_id):
+    # resume text from an upload (a SpooledPDF from read_pdf_form, which this takes ownership of),
+    # or from an earlier upload when only resume_id is given
+    if upload is None:
+        if not resume_id:
+            raise PDFError("Provide a PDF file or a resume_id")
+        text = await resume_cache.get(resume_id)
+        if text is None:
+            raise ResumeNotFound("Resume not found or expired; upload the file again")
+        return resume_id, text, 0.0
+
+    return await ingest(upload.resume_id, upload.source(), upload.discard)
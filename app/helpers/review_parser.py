@@ -0,0 +1,146 @@
+import json
+from typing import List
+from pydantic import BaseModel, ValidationError, field_validator
+
+# Structured output for /resume-review. The model is asked for one JSON object, but replies are sometimes
+# wrapped in prose or a ```json fence, or cut off by max_tokens. ReviewParser scans the reply as it arrives
+# (streamed or whole), hands out each category as soon as its object closes, and at the end returns the full
+# review, or as much of it as was complete when the text stopped, instead of failing the whole generation.
+
+class Category(BaseModel):
+    name: str
+    score: int
+    suggestions: List[str]
+
+    @field_validator("score", mode="before")
+    @classmethod
+    def clamp_score(cls, value):
+        # pydantic only turns ValueError into a validation error, so null, lists and Infinity are converted here
+        try:
+            return max(0, min(100, round(float(value))))
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f"Score isn't a number: {value!r}")
+
+class Review(BaseModel):
+    categories_and_improvements: List[Category]
+    feedback: str
+
+class ReviewParseError(ValueError):
+    pass
+
+CATEGORIES_KEY = "categories_and_improvements"
+FEEDBACK_KEY = "feedback"
+
+def decode_partial_string(literal):
+    # a JSON string literal that may have been cut off mid-escape; returns as much text as can be decoded
+    for end in range(len(literal), max(len(literal) - 6, 0), -1):
+        try:
+            return json.loads(literal[:end] + '"')
+        except json.JSONDecodeError:
+            continue
+    return ""
+
+class ReviewParser:
+    # Character-level scanner that tracks strings, nesting and the key each container was opened under.
+    # Text before the first "{" (prose, a code fence) is skipped.
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.stack = []  # [bracket, key it was opened under, start index]
+        self.in_string = False
+        self.escaped = False
+        self.string_start = None
+        self.last_string = None  # the most recent complete string, a key once ":" follows
+        self.key = None  # key for the next value in the innermost object
+        self.categories = []
+        self.feedback = None
+        self.feedback_start = None
+        self.document = None  # the whole top-level object once it closes
+
+    def feed(self, chunk):
+        # returns the categories completed by this chunk
+        self.text += chunk
+        completed = []
+        while self.pos < len(self.text) and self.document is None:
+            char = self.text[self.pos]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    self.end_string()
+            elif not self.stack:
+                if char == "{":
+                    self.open(char)
+            elif char == '"':
+                self.in_string = True
+                self.string_start = self.pos
+                if self.at_top() and self.key == FEEDBACK_KEY:
+                    self.feedback_start = self.pos
+            elif char == ":":
+                self.key = self.last_string
+            elif char == ",":
+                self.key = None
+            elif char in "{[":
+                self.open(char)
+            elif char in "}]":
+                category = self.close()
+                if category is not None:
+                    completed.append(category)
+            self.pos += 1
+        return completed
+
+    def at_top(self):
+        return len(self.stack) == 1
+
+    def open(self, char):
+        self.stack.append([char, self.key, self.pos])
+        self.key = None
+
+    def end_string(self):
+        literal = self.text[self.string_start:self.pos + 1]
+        try:
+            self.last_string = json.loads(literal)
+        except json.JSONDecodeError:
+            # an invalid escape; the raw text still works as a key, and the object holding it fails validation
+            self.last_string = literal[1:-1]
+        if self.feedback_start == self.string_start and self.at_top():
+            self.feedback = self.last_string
+
+    def close(self):
+        char, key, start = self.stack.pop()
+        self.key = None
+        if not self.stack:
+            self.document = self.text[start:self.pos + 1]
+            return None
+        # a category is an object directly inside the top-level categories array
+        parent = self.stack[-1]
+        if char == "{" and parent[0] == "[" and parent[1] == CATEGORIES_KEY and len(self.stack) == 2:
+            try:
+                category = Category.model_validate_json(self.text[start:self.pos + 1])
+            except ValidationError:
+                return None
+            self.categories.append(category)
+            return category
+        return None
+
+    def finish(self):
+        # (Review, complete); complete is False when the review was pieced together from a cut-off reply
+        if self.document is not None:
+            try:
+                return Review.model_validate_json(self.document), True
+            except ValidationError:
+                pass
+        if not self.categories:
+            raise ReviewParseError("Invalid response format")
+        feedback = self.feedback
+        if feedback is None and self.feedback_start is not None:
+            feedback = decode_partial_string(self.text[self.feedback_start:])
+        return Review(categories_and_improvements=self.categories, feedback=feedback or ""), False
+
+def parse_review(text):
+    parser = ReviewParser()
+    parser.feed(text)
+    return parser.finish()
@@ -0,0 +1,352 @@
+import os, sys, json, time, heapq, sqlite3, asyncio, logging, itertools
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from . import call_policy, metrics
+from .llm import get_client
+from .cache import SHARED_STATE_PATH
+from .context import estimate_tokens
+
+# Every LLM call goes through one scheduler per process: a global and per-endpoint cap on calls in flight,
+# a priority queue so interactive chat is served before standard and bulk work, and token buckets for
+# input and output tokens per minute so bursts queue here instead of being rate limited upstream.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+# per-endpoint caps, e.g. "chat=24,cover_letter=8,resume_review=8,tag=8,bulk=2"; unlisted endpoints only share the global cap
+LLM_ENDPOINT_LIMITS = {
+    name.strip(): int(limit)
+    for name, limit in (pair.split("=") for pair in os.getenv("LLM_ENDPOINT_LIMITS", "bulk=2").split(",") if pair.strip())
+}
+LLM_INPUT_TOKENS_PER_MINUTE = int(os.getenv("LLM_INPUT_TOKENS_PER_MINUTE", "0"))  # 0 = unlimited
+LLM_OUTPUT_TOKENS_PER_MINUTE = int(os.getenv("LLM_OUTPUT_TOKENS_PER_MINUTE", "0"))
+# "memory" gives every worker process its own buckets; "sqlite" makes the per-minute budgets apply to all
+# workers on the host together. LLM_MAX_CONCURRENCY and the endpoint caps are always per process.
+LLM_RATE_LIMIT_BACKEND = os.getenv("LLM_RATE_LIMIT_BACKEND", "memory")
+
+# lower runs first
+INTERACTIVE = 0  # a person is waiting on the chat screen
+STANDARD = 1  # single resume review / cover letter
+BACKGROUND = 2  # deferred tagging, bulk batch submission
+
+ENDPOINT_PRIORITY = {"chat": INTERACTIVE, "tag": INTERACTIVE, "cover_letter": STANDARD, "resume_review": STANDARD, "bulk": BACKGROUND}
+
+WAIT_SAMPLES = 1000  # recent queue waits kept for the percentiles in stats()
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    # refills continuously up to one minute's worth; a rate of 0 disables the limit
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount):
+        # seconds until amount can be taken; requests larger than the bucket only wait for it to be full
+        if not self.capacity:
+            return 0.0
+        self.refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(missing, 0) * 60 / self.capacity
+
+    def take(self, amount):
+        if self.capacity:
+            self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        if self.capacity:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    async def flush(self, timeout=None):
+        pass  # nothing shared to write back
+
+class SQLiteTokenBucket:
+    # TokenBucket shared by worker processes through a SQLite row. dispatch() runs on the event loop, so it
+    # only ever reads and updates a local copy of the level; the tokens taken or given back since the last
+    # sync are applied to the row, together with the refill, in one UPDATE ... RETURNING run in a thread,
+    # which also brings the local copy up to date. A sync follows every change and, when the bucket is
+    # being waited on, every SYNC_INTERVAL seconds, so workers can overdraw each other by at most what
+    # they grant in that window; that only makes the next wait longer. When the shared store can't be
+    # reached a sync is retried SYNC_ATTEMPTS times, SYNC_INTERVAL apart, and the local copy keeps limiting.
+    SYNC_INTERVAL = 0.5
+    SYNC_ATTEMPTS = 3
+
+    def __init__(self, per_minute, name, path=SHARED_STATE_PATH):
+        self.capacity = per_minute
+        self.name = name
+        self.path = path
+        self.local = TokenBucket(per_minute)
+        self.pending = 0.0  # tokens given back (positive) or taken (negative) since the last sync
+        self.synced = None  # time.monotonic() of the last sync
+        self.syncing = None  # task running sync()
+        self.created = False
+
+    def apply(self, change):
+        # runs in a thread; wall-clock time because the row is shared between processes
+        connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        try:
+            if not self.created:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("CREATE TABLE IF NOT EXISTS token_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+                connection.execute("INSERT OR IGNORE INTO token_buckets (name, tokens, updated) VALUES (?, ?, ?)", (self.name, float(self.capacity), time.time()))
+                self.created = True
+            (tokens,) = connection.execute(
+                "UPDATE token_buckets SET tokens = MIN(:capacity, MIN(:capacity, tokens + MAX(:now - updated, 0) * :capacity / 60) + :change), updated = :now "
+                "WHERE name = :name RETURNING tokens",
+                {"capacity": float(self.capacity), "now": time.time(), "change": change, "name": self.name},
+            ).fetchone()
+            return tokens
+        finally:
+            connection.close()
+
+    async def sync(self):
+        # True once the row and the local copy agree; on failure the change is kept for the next sync
+        change, self.pending = self.pending, 0.0
+        try:
+            tokens = await asyncio.to_thread(self.apply, change)
+        except sqlite3.Error:
+            self.pending += change
+            return False
+        self.local.tokens = min(self.capacity, tokens + self.pending)  # changes made while the thread ran
+        self.local.updated = self.synced = time.monotonic()
+        return True
+
+    def sync_soon(self):
+        if self.syncing is None:
+            async def run():
+                try:
+                    failures = 0
+                    while failures < self.SYNC_ATTEMPTS:
+                        if await self.sync():
+                            failures = 0
+                            if not self.pending:
+                                return
+                        else:
+                            failures += 1
+                            await asyncio.sleep(self.SYNC_INTERVAL)
+                    logger.warning("Couldn't sync the %s token bucket with %s; using this worker's copy", self.name, self.path)
+                finally:
+                    self.syncing = None
+            self.syncing = asyncio.get_running_loop().create_task(run())
+
+    async def flush(self, timeout=None):
+        # writes back what is pending; gives up after timeout seconds so shutdown can't hang on the shared store
+        if self.capacity and (self.pending or self.synced is None):
+            self.sync_soon()
+        if self.syncing is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(self.syncing), timeout)
+            except asyncio.TimeoutError:
+                self.syncing.cancel()
+
+    @property
+    def tokens(self):
+        if not self.capacity:
+            return 0.0
+        self.local.refill()
+        return self.local.tokens
+
+    def wait_time(self, amount):
+        if not self.capacity:
+            return 0.0
+        if self.synced is None or time.monotonic() - self.synced > self.SYNC_INTERVAL:
+            self.sync_soon()
+        return self.local.wait_time(amount)
+
+    def take(self, amount):
+        if self.capacity:
+            self.local.take(amount)
+            self.pending -= min(amount, self.capacity)
+            self.sync_soon()
+
+    def give_back(self, amount):
+        if self.capacity and amount:
+            self.local.give_back(amount)
+            self.pending += amount
+            self.sync_soon()
+
+def make_bucket(per_minute, name):
+    if LLM_RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteTokenBucket(per_minute, name)
+    if LLM_RATE_LIMIT_BACKEND == "memory":
+        return TokenBucket(per_minute)
+    raise ValueError(f"Unknown LLM_RATE_LIMIT_BACKEND: {LLM_RATE_LIMIT_BACKEND}")
+
+class Scheduler:
+    def __init__(self, max_concurrency, endpoint_limits, input_per_minute, output_per_minute):
+        self.max_concurrency = max_concurrency
+        self.endpoint_limits = endpoint_limits
+        self.input_bucket = make_bucket(input_per_minute, "input")
+        self.output_bucket = make_bucket(output_per_minute, "output")
+        self.queue = []  # heap of [priority, order, endpoint, input tokens, output tokens, future]
+        self.order = itertools.count()
+        self.active = 0
+        self.active_by_endpoint = Counter()
+        self.refill_timer = None
+        self.completed = 0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+
+    async def acquire(self, endpoint, priority, input_tokens, output_tokens):
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self.order), endpoint, input_tokens, output_tokens, future]
+        heapq.heappush(self.queue, entry)
+        started = time.monotonic()
+        self.dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(endpoint)  # granted just as the caller gave up
+            elif entry in self.queue:
+                # a dispatch() in the same tick may already have dropped the cancelled entry
+                self.queue.remove(entry)
+                heapq.heapify(self.queue)
+            raise
+        self.waits.append(time.monotonic() - started)
+        metrics.record_stage("llm_queue", self.waits[-1])
+
+    def release(self, endpoint, unused_output_tokens=0):
+        self.active -= 1
+        self.active_by_endpoint[endpoint] -= 1
+        self.output_bucket.give_back(unused_output_tokens)
+        self.completed += 1
+        self.dispatch()
+
+    def dispatch(self):
+        # Grants slots in priority order. An entry whose endpoint is at its cap is skipped so it can't hold
+        # up other endpoints; an entry waiting on tokens stops dispatch so lower priorities can't starve it.
+        skipped = []
+        while self.queue and self.active < self.max_concurrency:
+            entry = heapq.heappop(self.queue)
+            priority, _, endpoint, input_tokens, output_tokens, future = entry
+            if future.done():
+                continue
+            if self.active_by_endpoint[endpoint] >= self.endpoint_limits.get(endpoint, self.max_concurrency):
+                skipped.append(entry)
+                continue
+            wait = max(self.input_bucket.wait_time(input_tokens), self.output_bucket.wait_time(output_tokens))
+            if wait > 0:
+                skipped.append(entry)
+                self.schedule_refill(wait)
+                break
+            self.input_bucket.take(input_tokens)
+            self.output_bucket.take(output_tokens)
+            self.active += 1
+            self.active_by_endpoint[endpoint] += 1
+            future.set_result(None)
+        for entry in skipped:
+            heapq.heappush(self.queue, entry)
+
+    def schedule_refill(self, wait):
+        if self.refill_timer is None:
+            def refilled():
+                self.refill_timer = None
+                self.dispatch()
+            self.refill_timer = asyncio.get_running_loop().call_later(wait, refilled)
+
+    @asynccontextmanager
+    async def slot(self, endpoint, priority=None, input_tokens=0, output_tokens=0):
+        # yields a function to report actual usage; unused output tokens go back to the bucket on exit
+        priority = ENDPOINT_PRIORITY.get(endpoint, STANDARD) if priority is None else priority
+        await self.acquire(endpoint, priority, input_tokens, output_tokens)
+        used = {"output_tokens": output_tokens}
+        try:
+            yield lambda usage: used.update(output_tokens=usage.output_tokens)
+        finally:
+            self.release(endpoint, max(output_tokens - used["output_tokens"], 0))
+
+    async def drain(self, timeout):
+        # shutdown: wait for calls in flight and queued to finish; returns False if some were still running
+        deadline = time.monotonic() + timeout
+        while self.active or self.queue:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        # tokens given back by the last calls still have to reach a shared bucket
+        remaining = max(deadline - time.monotonic(), 0)
+        await asyncio.gather(self.input_bucket.flush(remaining), self.output_bucket.flush(remaining))
+        return True
+
+    def stats(self):
+        waits = sorted(self.waits)
+        return {
+            "active": self.active,
+            "active_by_endpoint": {endpoint: count for endpoint, count in self.active_by_endpoint.items() if count},
+            "queued": len(self.queue),
+            "queued_by_priority": dict(Counter(entry[0] for entry in self.queue)),
+            "completed": self.completed,
+            "wait_p50_ms": waits[len(waits) // 2] * 1000 if waits else 0.0,
+            "wait_p95_ms": waits[int(len(waits) * 0.95)] * 1000 if waits else 0.0,
+            "wait_max_ms": waits[-1] * 1000 if waits else 0.0,
+            "input_tokens_available": self.input_bucket.tokens if self.input_bucket.capacity else None,
+            "output_tokens_available": self.output_bucket.tokens if self.output_bucket.capacity else None,
+        }
+
+_scheduler = None
+_scheduler_loop = None
+
+def get_scheduler():
+    # one per event loop, like the client: its futures and timers belong to the loop
+    global _scheduler, _scheduler_loop
+    loop = asyncio.get_running_loop()
+    if _scheduler is None or _scheduler_loop is not loop:
+        _scheduler = Scheduler(LLM_MAX_CONCURRENCY, LLM_ENDPOINT_LIMITS, LLM_INPUT_TOKENS_PER_MINUTE, LLM_OUTPUT_TOKENS_PER_MINUTE)
+        _scheduler_loop = loop
+    return _scheduler
+
+def input_tokens(params):
+    return estimate_tokens(json.dumps(params.get("system", ""))) + estimate_tokens(json.dumps(params["messages"]))
+
+async def create_message(endpoint, priority=None, **params):
+    # scheduled client.messages.create
+    async with get_scheduler().slot(endpoint, priority, input_tokens(params), params["max_tokens"]) as report:
+        # retries and hedges reuse the slot, so a hedged chat call briefly has two requests upstream
+        with metrics.stage(f"llm_{endpoint}"):
+            response = await call_policy.call(endpoint, lambda: get_client().messages.create(**params))
+        report(response.usage)
+        metrics.record_usage(endpoint, params["model"], response.usage)
+        return response
+
+class ScheduledStream:
+    # wraps client.messages.stream; the slot is held from opening the stream until it is closed
+    def __init__(self, endpoint, priority=None, **params):
+        self.endpoint = endpoint
+        self.priority = priority
+        self.params = params
+
+    async def __aenter__(self):
+        self.slot = get_scheduler().slot(self.endpoint, self.priority, input_tokens(self.params), self.params["max_tokens"])
+        self.report = await self.slot.__aenter__()
+        self.started = time.perf_counter()
+        try:
+            # only opening the stream is retried; once events flow a failure reaches the caller
+            self.manager, self.stream = await call_policy.call(self.endpoint, self.open, hedge=False)
+        except BaseException:
+            await self.slot.__aexit__(*sys.exc_info())
+            raise
+        return self.stream
+
+    async def open(self):
+        manager = get_client().messages.stream(**self.params)
+        return manager, await manager.__aenter__()
+
+    async def __aexit__(self, *exc_info):
+        try:
+            snapshot = self.stream.current_message_snapshot
+            if snapshot.usage:
+                self.report(snapshot.usage)
+                metrics.record_usage(self.endpoint, self.params["model"], snapshot.usage)
+        except Exception:
+            pass  # no message yet; the full reservation stays spent
+        try:
+            return await self.manager.__aexit__(*exc_info)
+        finally:
+            metrics.record_stage(f"llm_{self.endpoint}", time.perf_counter() - self.started)
+            await self.slot.__aexit__(*exc_info)
+
+def stream_message(endpoint, priority=None, **params):
+    # scheduled client.messages.stream, used as an async context manager
+    return ScheduledStream(endpoint, priority, **params)
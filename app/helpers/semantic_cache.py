@@ -0,0 +1,185 @@
+import os, re, json, zlib, asyncio, logging
+from .response_cache import normalize
+
+# Near-duplicate lookup for first prompts ("how do I answer behavioral questions?" and "How to answer
+# behavioural questions" should share one answer). Prompts are embedded on the CPU as signed, hashed word
+# and character-trigram counts, so no model is needed. The cosine similarity only shortlists candidates: a
+# long prompt that differs in one entity ("... at Rockstar" vs "... at Ubisoft", junior vs senior) still scores
+# high, so an answer is served only when every content word of each prompt has a counterpart in the other,
+# equal or a spelling variant (TERM_SIMILARITY on character trigrams). The index lives in memory and is saved
+# next to chat.db on shutdown, merged with what other workers saved. numpy is imported on first use and the
+# index matrix is allocated with the first entry, so neither costs anything at startup.
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "./semantic_cache.npz")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.8"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "5000"))  # entries; the oldest are dropped first
+SEMANTIC_CACHE_DIM = 1024
+TERM_SIMILARITY = 0.7  # Dice coefficient of two words' trigrams: behavioral/behavioural 0.76, junior/senior 0.5
+MAX_CANDIDATES = 8  # shortlisted prompts checked word by word, closest first
+
+WORD_PATTERN = re.compile(r"\w+")
+# phrasing words shared by most prompts; counting them makes "answer for a Java developer" look like "... Python developer"
+STOP_WORDS = frozenset("a an the i me my you your to for of in on at and or do does did how what should can is are be with about after before".split())
+
+logger = logging.getLogger(__name__)
+
+def content_words(text):
+    return [word for word in WORD_PATTERN.findall(normalize(text)) if word not in STOP_WORDS]
+
+def trigrams(word):
+    padded = f" {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def features(text):
+    words = content_words(text)
+    return words + [gram for word in words for gram in trigrams(word)]
+
+def similar_words(first, second):
+    if first == second:
+        return True
+    first, second = set(trigrams(first)), set(trigrams(second))
+    return 2 * len(first & second) / (len(first) + len(second)) >= TERM_SIMILARITY
+
+def same_terms(first, second):
+    # every content word on each side matches one on the other, so a swapped name, level or number is a miss
+    first, second = set(content_words(first)), set(content_words(second))
+    return all(any(similar_words(word, other) for other in second) for word in first) and \
+        all(any(similar_words(word, other) for other in first) for word in second)
+
+def embed(text):
+    # unit vector; the sign bit of the hash spreads collisions so they cancel instead of piling up
+    import numpy as np
+
+    vector = np.zeros(SEMANTIC_CACHE_DIM, dtype=np.float32)
+    for feature in features(text):
+        hashed = zlib.crc32(feature.encode())
+        vector[hashed % SEMANTIC_CACHE_DIM] += 1.0 if hashed & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class SemanticCache:
+    # Fixed-size ring of unit vectors; once full, each new prompt overwrites the oldest one.
+
+    def __init__(self, path, threshold, max_entries, enabled=True):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.version = ""  # fingerprint of model + prompt, set by the router; a saved index with another version is discarded
+        self.vectors = None  # (max_entries, SEMANTIC_CACHE_DIM) once the first entry is added or loaded
+        self.entries = []  # row i of vectors belongs to entries[i]: {"prompt", "value"}
+        self.next_row = 0
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0  # candidates above the threshold whose content words differed
+
+    def lookup(self, prompt):
+        # returns (value, similarity) for the closest previous prompt with the same content words, or
+        # (None, best similarity) when there is none above the threshold
+        if not self.enabled:
+            return None, 0.0
+        if not self.entries:
+            self.misses += 1
+            return None, 0.0
+        similarities = self.vectors[:len(self.entries)] @ embed(prompt)
+        candidates = similarities.argsort()[::-1][:MAX_CANDIDATES]
+        for row in candidates:
+            similarity = float(similarities[row])
+            if similarity < self.threshold:
+                break
+            if same_terms(prompt, self.entries[row]["prompt"]):
+                self.hits += 1
+                return self.entries[row]["value"], similarity
+            self.rejected += 1
+        self.misses += 1
+        return None, float(similarities[candidates[0]])
+
+    def add(self, prompt, value):
+        if not self.enabled:
+            return
+        entry = {"prompt": prompt, "value": value}
+        if len(self.entries) < self.max_entries:
+            self.entries.append(entry)
+        else:
+            self.entries[self.next_row] = entry
+        self.allocate()[self.next_row] = embed(prompt)
+        self.next_row = (self.next_row + 1) % self.max_entries
+
+    def allocate(self):
+        import numpy as np
+
+        if self.vectors is None:
+            self.vectors = np.zeros((self.max_entries, SEMANTIC_CACHE_DIM), dtype=np.float32)
+        return self.vectors
+
+    def clear(self):
+        self.vectors = None
+        self.entries = []
+        self.next_row = 0
+
+    def save(self):
+        # Every worker has its own index and saves it on shutdown, so the file is merged rather than
+        # overwritten: entries already saved by other workers are kept unless this index has the same prompt.
+        # Rows are written oldest first, so a reload (even with a smaller SEMANTIC_CACHE_SIZE) keeps the newest.
+        import fcntl
+        import numpy as np
+
+        order = list(range(self.next_row, len(self.entries))) + list(range(self.next_row)) if len(self.entries) == self.max_entries else list(range(len(self.entries)))
+        vectors, entries = self.allocate()[order], [self.entries[row] for row in order]
+        with open(f"{self.path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # workers save on shutdown at the same time
+            saved = self.read()
+            if saved is not None:
+                own = {entry["prompt"] for entry in entries}
+                keep = [row for row, entry in enumerate(saved[1]) if entry["prompt"] not in own]
+                vectors = np.concatenate([saved[0][keep], vectors])[-self.max_entries:]
+                entries = ([saved[1][row] for row in keep] + entries)[-self.max_entries:]
+            temporary = f"{self.path}.{os.getpid()}.tmp.npz"
+            np.savez(temporary, vectors=vectors, entries=np.array(json.dumps(entries)), version=np.array(self.version))
+            os.replace(temporary, self.path)
+
+    def read(self):
+        # (vectors, entries) from the saved index, or None when there is none for this version
+        if not os.path.exists(self.path):
+            return None
+        import numpy as np
+
+        try:
+            with np.load(self.path) as saved:
+                if str(saved["version"]) != self.version or saved["vectors"].shape[1:] != (SEMANTIC_CACHE_DIM,):
+                    return None
+                return saved["vectors"], json.loads(str(saved["entries"]))
+        except Exception:
+            logger.exception("Ignoring unreadable semantic cache index at %s", self.path)
+            return None
+
+    def load(self):
+        saved = self.read()
+        if saved is None:
+            return
+        vectors, entries = saved[0][-self.max_entries:], saved[1][-self.max_entries:]
+        self.clear()
+        self.allocate()[:len(entries)] = vectors
+        self.entries = entries
+        self.next_row = len(entries) % self.max_entries
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+semantic_cache = SemanticCache(SEMANTIC_CACHE_PATH, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_ENABLED)
+
+async def load_index():
+    if semantic_cache.enabled:
+        await asyncio.to_thread(semantic_cache.load)
+
+async def save_index():
+    if semantic_cache.enabled:
+        await asyncio.to_thread(semantic_cache.save)
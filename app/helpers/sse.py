@@ -0,0 +1,29 @@
+import json
+from fastapi.responses import StreamingResponse
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events, headers=None):
+    # X-Accel-Buffering stops nginx-style proxies from holding the stream back
+    return StreamingResponse(events, media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+        **(headers or {}),
+    })
+
+async def stream_text(stream_manager, stripper, usages=None):
+    # forward a streamed completion as "delta" events, unwrapped by a TagStripper as it arrives;
+    # the final message's usage is appended to usages once the stream completes
+    async with stream_manager as stream:
+        async for chunk in stream.text_stream:
+            text = stripper.feed(chunk)
+            if text:
+                yield sse_event("delta", {"text": text})
+        
+        if usages is not None:
+            usages.append((await stream.get_final_message()).usage)
+    
+    text = stripper.flush()
+    if text:
+        yield sse_event("delta", {"text": text})
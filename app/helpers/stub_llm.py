@@ -0,0 +1,257 @@
+import os, json, time, uuid, random, asyncio
+import httpx
+from datetime import datetime, timedelta, timezone
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+
+# Local stand-in for the Anthropic Messages API (plain, streamed and batched); it never calls out to the network.
+# Run it in-process with LLM_BACKEND=stub (see llm.get_client), or serve it and point the SDK at it with
+# ANTHROPIC_BASE_URL=http://127.0.0.1:<port>, as load_test.py does.
+STUB_LLM_LATENCY = float(os.getenv("STUB_LLM_LATENCY", "0.5"))  # seconds per completion
+STUB_LLM_OUTPUT_TOKENS_PER_SECOND = float(os.getenv("STUB_LLM_OUTPUT_TOKENS_PER_SECOND", "0"))  # generation speed on top of the latency; 0 = instant
+STUB_LLM_STREAM_CHUNK = 16  # characters per streamed text delta
+STUB_LLM_FAILURE_RATE = float(os.getenv("STUB_LLM_FAILURE_RATE", "0"))  # fraction of message requests answered with a 529
+
+REVIEW_RESPONSE = {
+    "categories_and_improvements": [
+        {"name": name, "score": 70, "suggestions": ["Quantify results with concrete numbers.", "Tailor wording to the job description."]}
+        for name in ["Content Quality", "Achievements and Impact", "Grammar and Language", "Experience and Skills Relevance"]
+    ],
+    "feedback": "## Summary\nThe resume is a reasonable match for the role.",
+}
+
+def system_text(system):
+    if isinstance(system, list):
+        return "".join(block.get("text", "") for block in system)
+    return system or ""
+
+def canned_text(system):
+    # pick the output format the calling router expects from its system prompt
+    text = system_text(system)
+    if "<answer>" in text:
+        return "<answer>## Overview\nStub answer for interview preparation.\n\n## Key points\n- Practice out loud\n- Use the STAR method</answer>"
+    if "<cover_letter>" in text:
+        return "<cover_letter>Dear Hiring Manager,\n\nStub cover letter body.\n\nBest regards,\nCandidate</cover_letter>"
+    if "categories_and_improvements" in text:
+        return json.dumps(REVIEW_RESPONSE)
+    return "stub interview prep tag"
+
+# prompt cache emulation: prefixes ending in a cache_control block that have been seen before
+cached_prefixes = set()
+
+def usage_for(payload, text):
+    input_tokens = len(json.dumps(payload)) // 4
+    usage = {"input_tokens": input_tokens, "output_tokens": len(text) // 4, "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0}
+    
+    system = payload.get("system")
+    if isinstance(system, list):
+        breakpoints = [i for i, block in enumerate(system) if block.get("cache_control")]
+        if breakpoints:
+            prefix = json.dumps(system[:breakpoints[-1] + 1])
+            key = "cache_read_input_tokens" if prefix in cached_prefixes else "cache_creation_input_tokens"
+            cached_prefixes.add(prefix)
+            usage[key] = len(prefix) // 4
+            usage["input_tokens"] = max(input_tokens - usage[key], 0)
+    return usage
+
+def message_body(payload, text):
+    return {
+        "id": f"msg_stub_{uuid.uuid4().hex}",
+        "type": "message",
+        "role": "assistant",
+        "model": payload.get("model", "stub"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": usage_for(payload, text),
+    }
+
+stub_app = FastAPI()
+
+# Fault injection for exercising call_policy. Besides the random STUB_LLM_FAILURE_RATE, tests queue deterministic
+# faults with POST /stub/faults: the next fail_next requests get an error with the given status, and the next
+# delay_next requests are held for delay extra seconds.
+ERROR_TYPES = {429: "rate_limit_error", 500: "api_error", 503: "api_error", 529: "overloaded_error"}
+faults = {"fail_next": 0, "status": 529, "delay_next": 0, "delay": 0.0}
+
+@stub_app.post("/stub/faults")
+async def set_faults(request: Request):
+    faults.update({key: value for key, value in (await request.json()).items() if key in faults})
+    return faults
+
+def injected_failure():
+    if faults["fail_next"] > 0:
+        faults["fail_next"] -= 1
+        status = faults["status"]
+    elif random.random() < STUB_LLM_FAILURE_RATE:
+        status = 529
+    else:
+        return None
+    error = {"type": ERROR_TYPES.get(status, "api_error"), "message": "Injected fault"}
+    return JSONResponse({"type": "error", "error": error}, status_code=status)
+
+def injected_delay():
+    if faults["delay_next"] > 0:
+        faults["delay_next"] -= 1
+        return faults["delay"]
+    return 0.0
+
+def completion_time(text):
+    if not STUB_LLM_OUTPUT_TOKENS_PER_SECOND:
+        return STUB_LLM_LATENCY
+    return STUB_LLM_LATENCY + len(text) // 4 / STUB_LLM_OUTPUT_TOKENS_PER_SECOND
+
+def stream_events(payload, text):
+    # same event sequence the Messages API emits for a single text block
+    message = message_body(payload, "")
+    yield "message_start", {"type": "message_start", "message": {**message, "stop_reason": None}}
+    yield "content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}
+    for start in range(0, len(text), STUB_LLM_STREAM_CHUNK):
+        delta = {"type": "text_delta", "text": text[start:start + STUB_LLM_STREAM_CHUNK]}
+        yield "content_block_delta", {"type": "content_block_delta", "index": 0, "delta": delta}
+    yield "content_block_stop", {"type": "content_block_stop", "index": 0}
+    yield "message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": len(text) // 4}}
+    yield "message_stop", {"type": "message_stop"}
+
+@stub_app.post("/v1/messages")
+async def create_message(request: Request):
+    payload = await request.json()
+    text = canned_text(payload.get("system"))
+    
+    failure = injected_failure()
+    if failure:
+        return failure
+    await asyncio.sleep(injected_delay())
+    
+    if payload.get("stream"):
+        async def event_stream():
+            events = list(stream_events(payload, text))
+            # spread the latency over the deltas so time-to-first-token is realistic
+            delay = completion_time(text) / len(events)
+            for event, data in events:
+                await asyncio.sleep(delay)
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+    
+    await asyncio.sleep(completion_time(text))
+    return message_body(payload, text)
+
+# Message Batches: a batch reports "in_progress" for STUB_LLM_LATENCY seconds, then every request has succeeded
+batches = {}  # batch id -> {"started", "created_at", "requests"}
+
+def batch_body(request, batch_id):
+    batch = batches[batch_id]
+    ended = time.monotonic() - batch["started"] >= STUB_LLM_LATENCY
+    count = len(batch["requests"])
+    return {
+        "id": batch_id,
+        "type": "message_batch",
+        "processing_status": "ended" if ended else "in_progress",
+        "request_counts": {"processing": 0 if ended else count, "succeeded": count if ended else 0, "errored": 0, "canceled": 0, "expired": 0},
+        "created_at": batch["created_at"].isoformat(),
+        "expires_at": (batch["created_at"] + timedelta(days=1)).isoformat(),
+        "ended_at": datetime.now(timezone.utc).isoformat() if ended else None,
+        "cancel_initiated_at": None,
+        "archived_at": None,
+        "results_url": f"{request.base_url}v1/messages/batches/{batch_id}/results" if ended else None,
+    }
+
+@stub_app.post("/v1/messages/batches")
+async def create_batch(request: Request):
+    failure = injected_failure()
+    if failure:
+        return failure
+    payload = await request.json()
+    batch_id = f"msgbatch_stub_{uuid.uuid4().hex}"
+    batches[batch_id] = {"started": time.monotonic(), "created_at": datetime.now(timezone.utc), "requests": payload["requests"]}
+    return batch_body(request, batch_id)
+
+@stub_app.get("/v1/messages/batches/{batch_id}")
+async def retrieve_batch(batch_id: str, request: Request):
+    if batch_id not in batches:
+        return JSONResponse({"type": "error", "error": {"type": "not_found_error", "message": "Batch not found"}}, status_code=404)
+    return batch_body(request, batch_id)
+
+@stub_app.get("/v1/messages/batches/{batch_id}/results")
+async def batch_results(batch_id: str):
+    lines = [
+        json.dumps({"custom_id": item["custom_id"], "result": {"type": "succeeded", "message": message_body(item["params"], canned_text(item["params"].get("system")))}})
+        for item in batches[batch_id]["requests"]
+    ]
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="application/binary")
+
+class InProcessTransport(httpx.AsyncBaseTransport):
+    # Serves the SDK's requests from stub_app without a socket. httpx.ASGITransport buffers the whole response,
+    # which would turn streamed completions into one burst; this hands each body chunk over as the app sends it.
+    def __init__(self, app):
+        self.app = app
+
+    async def handle_async_request(self, request):
+        body = await request.aread()
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": request.method,
+            "scheme": request.url.scheme,
+            "path": request.url.path,
+            "raw_path": request.url.raw_path.split(b"?")[0],
+            "query_string": request.url.query,
+            "root_path": "",
+            "headers": [(name.lower(), value) for name, value in request.headers.raw],
+            "server": (request.url.host, request.url.port or 80),
+            "client": ("127.0.0.1", 0),
+        }
+        started = asyncio.get_running_loop().create_future()
+        chunks = asyncio.Queue()
+        closed = asyncio.Event()
+        sent_body = False
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await closed.wait()  # streaming responses listen for a disconnect until the client closes
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                started.set_result((message["status"], message.get("headers", [])))
+            elif message["type"] == "http.response.body":
+                if message.get("body"):
+                    chunks.put_nowait(message["body"])
+                if not message.get("more_body", False):
+                    chunks.put_nowait(None)
+
+        async def run():
+            try:
+                await self.app(scope, receive, send)
+            except Exception as error:
+                if not started.done():
+                    started.set_exception(error)
+                chunks.put_nowait(None)
+
+        task = asyncio.create_task(run())
+        try:
+            status, headers = await started
+        except BaseException:
+            task.cancel()
+            raise
+        return httpx.Response(status, headers=headers, stream=InProcessStream(chunks, closed, task), request=request)
+
+class InProcessStream(httpx.AsyncByteStream):
+    def __init__(self, chunks, closed, task):
+        self.chunks = chunks
+        self.closed = closed
+        self.task = task
+
+    async def __aiter__(self):
+        while (chunk := await self.chunks.get()) is not None:
+            yield chunk
+
+    async def aclose(self):
+        self.closed.set()
+        if not self.task.done():
+            self.task.cancel()
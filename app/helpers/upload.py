@@ -0,0 +1,236 @@
+import os, asyncio, hashlib, tempfile
+from urllib.parse import parse_qsl
+from python_multipart.multipart import MultipartParser, parse_options_header
+from .pdf import check_size, PDFError, PDF_MAX_BYTES
+
+# Multipart parsing for the PDF routes without buffering the upload first. The request body is fed to
+# python-multipart as it arrives: the declared Content-Length, every field and the PDF are size checked on the
+# way, the PDF must show its %PDF- header in the first KB, and it is hashed while it streams so the resume_id
+# needs no second pass. Small PDFs stay in memory; larger ones spill to a temporary file that the PDF worker
+# opens by path, so the API process never holds a full copy.
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(512 * 1024)))  # PDFs above this are written to disk
+UPLOAD_SPILL_BATCH = 256 * 1024  # bytes queued before they are written to the temporary file
+UPLOAD_MAX_FIELD_BYTES = 64 * 1024  # each text field; a job description is at most 10000 characters
+UPLOAD_MAX_PARTS = 16
+UPLOAD_MAX_BYTES = PDF_MAX_BYTES + UPLOAD_MAX_PARTS * UPLOAD_MAX_FIELD_BYTES  # whole body, multipart framing included
+TOO_LARGE = f"Upload is larger than the {UPLOAD_MAX_BYTES / (1024 * 1024):.0f} MB limit"
+
+PDF_HEADER = b"%PDF-"
+PDF_HEADER_WINDOW = 1024  # readers accept junk before the header, but only this far in
+
+class UploadError(PDFError):
+    # the form itself is unusable (missing or oversized field, malformed body); routes answer 400 like other PDFErrors
+    pass
+
+class SpooledPDF:
+    # write() is called from the parser callbacks on the event loop, so once the PDF is past UPLOAD_SPOOL_BYTES
+    # it only queues the chunks; spill() writes them to the temporary file in a thread, UPLOAD_SPILL_BATCH at a time
+    def __init__(self):
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.head = b""
+        self.buffer = bytearray()
+        self.file = None
+        self.pending = []  # chunks waiting for spill()
+        self.pending_bytes = 0
+
+    def write(self, data):
+        self.size += len(data)
+        check_size(self.size)
+        self.digest.update(data)
+
+        if len(self.head) < PDF_HEADER_WINDOW:
+            self.head += data[:PDF_HEADER_WINDOW - len(self.head)]
+            if len(self.head) >= PDF_HEADER_WINDOW:
+                self.check_header()
+
+        if self.buffer is not None:
+            self.buffer += data
+            if self.size <= UPLOAD_SPOOL_BYTES:
+                return
+            data, self.buffer = self.buffer, None
+        self.pending.append(data)
+        self.pending_bytes += len(data)
+
+    def write_pending(self, chunks, close):
+        # runs in a thread
+        if self.file is None:
+            self.file = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+        self.file.writelines(chunks)
+        if close:
+            self.file.close()
+
+    async def spill(self, close=False):
+        # close=True once the part has ended: the file is complete and the worker can open it by path
+        chunks, self.pending, self.pending_bytes = self.pending, [], 0
+        if chunks or (close and self.file is not None):
+            await asyncio.to_thread(self.write_pending, chunks, close)
+
+    def check_header(self):
+        if PDF_HEADER not in self.head:
+            raise PDFError("File isn't a valid PDF")
+
+    def finish(self):
+        if not self.size:
+            raise PDFError("File is empty")
+        self.check_header()
+
+    @property
+    def resume_id(self):
+        return self.digest.hexdigest()
+
+    def source(self):
+        # what extract_text takes: the bytes, or the path of the spilled file
+        return self.file.name if self.file is not None else self.buffer
+
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+            try:
+                os.unlink(self.file.name)
+            except FileNotFoundError:
+                pass
+        self.buffer = None
+        self.pending = []
+
+class PDFForm:
+    # Streaming parser for one multipart form: text fields plus at most one PDF under file_field. check_field
+    # is called with (name, value) as each field completes, so a bad field can stop the upload before the
+    # file that follows it is received.
+    def __init__(self, boundary, file_field="file", check_field=None):
+        self.file_field = file_field
+        self.check_field = check_field
+        self.fields = {}
+        self.upload = None
+        self.parts = 0
+        self.header_field = b""
+        self.header_value = b""
+        self.headers = {}
+        self.part = None  # the field name, or the SpooledPDF being written
+        self.value = bytearray()
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": lambda data, start, end: self.add_header_bytes("header_field", data[start:end]),
+            "on_header_value": lambda data, start, end: self.add_header_bytes("header_value", data[start:end]),
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        })
+
+    def add_header_bytes(self, name, data):
+        setattr(self, name, getattr(self, name) + data)
+        if len(self.header_field) + len(self.header_value) > UPLOAD_MAX_FIELD_BYTES:
+            raise UploadError("Multipart header is too long")
+
+    def on_part_begin(self):
+        self.parts += 1
+        if self.parts > UPLOAD_MAX_PARTS:
+            raise UploadError(f"Form has more than {UPLOAD_MAX_PARTS} fields")
+        self.headers = {}
+        self.value = bytearray()
+
+    def on_header_end(self):
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = b""
+        self.header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        if b"filename" not in options:
+            self.part = name
+            return
+        if name != self.file_field or self.upload is not None:
+            raise UploadError(f"Unexpected file field: {name}")
+        if not options[b"filename"]:
+            self.part = None  # a file input left empty
+            return
+        content_type, _ = parse_options_header(self.headers.get(b"content-type", b""))
+        if content_type != b"application/pdf":
+            raise PDFError("File isn't a PDF")
+        self.upload = self.part = SpooledPDF()
+
+    def on_part_data(self, data, start, end):
+        if isinstance(self.part, SpooledPDF):
+            self.part.write(data[start:end])
+        elif self.part is not None:
+            self.value += data[start:end]
+            if len(self.value) > UPLOAD_MAX_FIELD_BYTES:
+                raise UploadError(f"Field {self.part} is too long")
+
+    def on_part_end(self):
+        if isinstance(self.part, SpooledPDF):
+            self.part.finish()
+        elif self.part is not None:
+            value = self.value.decode("utf-8", "replace")
+            self.fields[self.part] = value
+            if self.check_field:
+                self.check_field(self.part, value)
+        self.part = None
+
+async def read_pdf_form(request, required=(), check_field=None):
+    # (fields, SpooledPDF or None); the upload is handed on to load_resume, which discards it when done
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > UPLOAD_MAX_BYTES:
+        raise UploadError(TOO_LARGE)
+    if content_type == b"application/x-www-form-urlencoded":
+        # no file, so only a resume_id can be used
+        fields = await read_urlencoded(request)
+        check_required(fields, required)
+        if check_field:
+            for name, value in fields.items():
+                check_field(name, value)
+        return fields, None
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise UploadError("Expected a multipart/form-data body")
+
+    form = PDFForm(options[b"boundary"], check_field=check_field)
+    received = 0
+    try:
+        async for chunk in request.stream():
+            # a chunked body has no Content-Length to check up front
+            received += len(chunk)
+            if received > UPLOAD_MAX_BYTES:
+                raise UploadError(TOO_LARGE)
+            form.parser.write(chunk)
+            if form.upload is not None and form.upload.pending_bytes >= UPLOAD_SPILL_BATCH:
+                await form.upload.spill()
+        form.parser.finalize()
+        check_required(form.fields, required)
+        if form.upload is not None:
+            await form.upload.spill(close=True)
+    except PDFError:
+        if form.upload is not None:
+            form.upload.discard()
+        raise
+    except Exception:
+        if form.upload is not None:
+            form.upload.discard()
+        raise UploadError("Malformed multipart body")  # including a client that disconnected mid-upload
+    return form.fields, form.upload
+
+def check_required(fields, required):
+    missing = [name for name in required if name not in fields]
+    if missing:
+        raise UploadError(f"Missing form field: {', '.join(missing)}")
+
+async def read_urlencoded(request):
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > UPLOAD_MAX_PARTS * UPLOAD_MAX_FIELD_BYTES:
+            raise UploadError("Form is too large")
+    return dict(parse_qsl(body.decode("utf-8", "replace"), keep_blank_values=True))
+
+def form_bool(value):
+    return (value or "").strip().lower() in ("1", "true", "yes", "on")
+
+def form_openapi(required, optional):
+    # request body docs for routes that read the form themselves; "file" is the PDF
+    properties = {
+        name: {"type": "string", "format": "binary"} if name == "file" else {"type": "boolean"} if name == "no_cache" else {"type": "string"}
+        for name in [*required, *optional]
+    }
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {"type": "object", "properties": properties, "required": list(required)}}}}}
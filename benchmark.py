@@ -0,0 +1,365 @@
+import os, sys, json, time, random, asyncio, argparse, tempfile, platform
+from datetime import datetime, timezone
+
+# Reproducible benchmark of the five API endpoints against the in-process stub LLM, so it needs no API key or
+# network and leaves chat.db alone. Every endpoint is driven with --requests requests at each --concurrency
+# level and reported with p50/p95/p99 latency, requests/sec, event-loop lag, DB write latency and PDF parse
+# time. --save stores the results; --baseline diffs a run against stored results and exits 1 when a metric
+# regresses by more than --tolerance.
+#
+#   python benchmark.py --concurrency 1 8 32 --save benchmark_baseline.json
+#   python benchmark.py --concurrency 1 8 32 --baseline benchmark_baseline.json
+#   python benchmark.py --extraction   # micro-benchmarks of tag extraction on multi-kilobyte answers
+#   python benchmark.py --startup --save startup_baseline.json   # cold import and lifespan startup time
+#
+# The load generator shares the app's event loop (requests go through httpx.ASGITransport), so loop lag
+# includes the client's own overhead; compare runs made with the same settings.
+
+ENDPOINTS = ["create-conversation", "update-conversation", "get-conversation", "resume-review", "cover-letter-generator"]
+
+PROMPTS = [
+    "How should I prepare for a coding interview?",
+    "How do I answer 'tell me about yourself'?",
+    "What questions should I ask at the end of an interview?",
+    "How do I explain a career change to an interviewer?",
+    "How do I prepare for a system design interview?",
+    "What is the STAR method and when should I use it?",
+    "How do I negotiate salary after an offer?",
+    "How should I talk about a project that failed?",
+]
+
+JOB_DESCRIPTION = "We are looking for a software engineer with strong Python experience and a background in building cloud-based web services."
+
+# metric -> True when a larger value is better
+METRICS = {
+    "p50_ms": False, "p95_ms": False, "p99_ms": False, "rps": True,
+    "loop_lag_p99_ms": False, "db_write_p95_ms": False, "pdf_parse_p50_ms": False,
+    "import_ms": False, "ready_ms": False,
+}
+
+# heavy dependencies that should only be imported once a request needs them
+LAZY_MODULES = ["fitz", "anthropic", "httpx", "numpy"]
+
+# run in a fresh interpreter per sample so nothing is already imported or cached
+STARTUP_SCRIPT = """
+import sys, json, time, asyncio
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+loaded = [name for name in %r if name in sys.modules]
+
+async def ready():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+print(json.dumps({"import_ms": (imported - started) * 1000, "ready_ms": (asyncio.run(ready()) - started) * 1000, "loaded": loaded}))
+"""
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+def sample_corpus(size, seed):
+    # synthetic one to three page resumes; the same seed gives the same corpus
+    import fitz
+
+    rng = random.Random(seed)
+    skills = ["Python", "FastAPI", "AWS", "PostgreSQL", "Docker", "Kubernetes", "React", "Go", "Terraform", "Kafka"]
+    corpus = []
+    for index in range(size):
+        document = fitz.open()
+        for page_number in range(rng.randint(1, 3)):
+            page = document.new_page()
+            lines = [f"Candidate {index} - page {page_number + 1}", "Software Engineer"]
+            lines += [f"- Built {rng.choice(skills)} services handling {rng.randint(1, 900)}k requests a day" for _ in range(25)]
+            page.insert_text((72, 72), "\n".join(lines), fontsize=9)
+        corpus.append(document.tobytes())
+    return corpus
+
+def load_corpus(directory):
+    names = sorted(name for name in os.listdir(directory) if name.lower().endswith(".pdf"))
+    if not names:
+        sys.exit(f"No PDFs in {directory}")
+    corpus = []
+    for name in names:
+        with open(os.path.join(directory, name), "rb") as file:
+            corpus.append(file.read())
+    return corpus
+
+class LoopLag:
+    # how late a 10 ms timer fires while the benchmark runs
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(time.perf_counter() - started - self.interval, 0.0))
+
+class DBWrites:
+    # duration of every INSERT/UPDATE/DELETE statement the engine executes
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.samples = []
+        event.listen(engine.sync_engine, "before_cursor_execute", self.before)
+        event.listen(engine.sync_engine, "after_cursor_execute", self.after)
+
+    def before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("benchmark_started", []).append(time.perf_counter())
+
+    def after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["benchmark_started"].pop()
+        if statement.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE"):
+            self.samples.append(time.perf_counter() - started)
+
+class Driver:
+    def __init__(self, client, corpus, seed):
+        self.client = client
+        self.corpus = corpus
+        self.rng = random.Random(seed)
+        self.uploads = 0
+        self.conversation_ids = []
+
+    def upload(self):
+        # a trailing comment after %%EOF makes every upload unique, so each request parses its PDF instead of hitting the resume cache
+        pdf_bytes = self.corpus[self.uploads % len(self.corpus)] + f"\n%benchmark {self.uploads}\n".encode()
+        self.uploads += 1
+        return {"file": ("resume.pdf", pdf_bytes, "application/pdf")}
+
+    async def request(self, endpoint):
+        form = {"job_description": JOB_DESCRIPTION, "no_cache": "true"}
+        if endpoint == "create-conversation":
+            return await self.client.post("/create-conversation", json={"prompt": self.rng.choice(PROMPTS), "no_cache": True})
+        if endpoint == "update-conversation":
+            return await self.client.put("/update-conversation", json={"conversation_id": self.rng.choice(self.conversation_ids), "prompt": self.rng.choice(PROMPTS)})
+        if endpoint == "get-conversation":
+            return await self.client.post("/get-conversation", json={"conversation_id": self.rng.choice(self.conversation_ids)})
+        return await self.client.post(f"/{endpoint}", files=self.upload(), data=form)
+
+    async def seed_conversations(self, count):
+        for _ in range(count):
+            response = await self.request("create-conversation")
+            response.raise_for_status()
+            self.conversation_ids.append(response.json()["data"]["conversation_id"])
+
+    async def run(self, endpoint, concurrency, total, db_writes):
+        latencies = []
+        parse_times = []
+        errors = 0
+        remaining = iter(range(total))
+
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                started = time.perf_counter()
+                response = await self.request(endpoint)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+                for timing in response.headers.get("server-timing", "").split(", "):
+                    if timing.startswith("pdf;dur="):
+                        parse_times.append(float(timing.split("=", 1)[1]) / 1000)
+
+        lag = LoopLag()
+        lag_task = asyncio.create_task(lag.run())
+        db_writes.samples.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        lag_task.cancel()
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 2)
+
+        return {
+            "requests": total,
+            "errors": errors,
+            "p50_ms": ms(percentile(latencies, 0.50)),
+            "p95_ms": ms(percentile(latencies, 0.95)),
+            "p99_ms": ms(percentile(latencies, 0.99)),
+            "rps": round(total / elapsed, 2),
+            "loop_lag_p99_ms": ms(percentile(lag.samples, 0.99)),
+            "loop_lag_max_ms": ms(max(lag.samples, default=None)),
+            "db_write_p50_ms": ms(percentile(db_writes.samples, 0.50)),
+            "db_write_p95_ms": ms(percentile(db_writes.samples, 0.95)),
+            "pdf_parse_p50_ms": ms(percentile(parse_times, 0.50)),
+            "pdf_parse_p95_ms": ms(percentile(parse_times, 0.95)),
+        }
+
+async def benchmark(args, corpus):
+    import httpx
+    from main import app
+    from app.database import engine
+
+    db_writes = DBWrites(engine)
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=300) as client:
+            driver = Driver(client, corpus, args.seed)
+            await driver.seed_conversations(max(args.concurrency))
+            for endpoint in args.endpoints:
+                for concurrency in args.concurrency:
+                    # one untimed pass warms the PDF pool, prompt cache emulation and connection pool
+                    await driver.run(endpoint, concurrency, concurrency, db_writes)
+                    results[f"{endpoint}@{concurrency}"] = await driver.run(endpoint, concurrency, args.requests, db_writes)
+                    print_row(endpoint, concurrency, results[f"{endpoint}@{concurrency}"])
+    return results
+
+def fmt(value):
+    return "-" if value is None else f"{value:.1f}"
+
+def print_header():
+    print(f"{'endpoint':<24}{'conc':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}{'lag p99':>9}{'db p95':>9}{'pdf p50':>9}{'errors':>8}")
+
+def print_row(endpoint, concurrency, result):
+    print(
+        f"{endpoint:<24}{concurrency:>5}{fmt(result['p50_ms']):>9}{fmt(result['p95_ms']):>9}{fmt(result['p99_ms']):>9}"
+        f"{fmt(result['rps']):>9}{fmt(result['loop_lag_p99_ms']):>9}{fmt(result['db_write_p95_ms']):>9}"
+        f"{fmt(result['pdf_parse_p50_ms']):>9}{result['errors']:>8}"
+    )
+
+def extraction_benchmark(sizes, chunk_size, number):
+    # microseconds per reply: the old per-call re.search, extract_tag on the whole reply, and TagStripper fed
+    # in chunk_size pieces the way a stream arrives
+    import re, timeit
+    from app.helpers.re_helper import extract_tag, TagStripper
+
+    def streamed(chunks):
+        stripper = TagStripper("answer")
+        for chunk in chunks:
+            stripper.feed(chunk)
+        stripper.flush()
+        return stripper.text
+
+    print(f"{'answer':>8}{'re.search':>12}{'extract_tag':>13}{'streamed':>12}  (us per reply, {chunk_size}-char chunks)")
+    for size in sizes:
+        body = ("- Practice the STAR method <b>out loud</b> before the interview.\n" * (size * 1024 // 64 + 1))[:size * 1024]
+        reply = f"Here is my answer.\n<answer>{body}</answer>"
+        chunks = [reply[index:index + chunk_size] for index in range(0, len(reply), chunk_size)]
+        assert extract_tag(reply, "answer") == streamed(chunks) == body
+
+        cases = [
+            lambda: re.search(r"<answer>(.*?)</answer>", reply, re.DOTALL).group(1),
+            lambda: extract_tag(reply, "answer"),
+            lambda: streamed(chunks),
+        ]
+        timings = [min(timeit.repeat(case, number=number, repeat=5)) / number * 1e6 for case in cases]
+        print(f"{size:>6}KB{timings[0]:>12.1f}{timings[1]:>13.1f}{timings[2]:>12.1f}")
+
+def startup_benchmark(runs):
+    # import_ms is `import main`, ready_ms adds the lifespan startup (migration, PDF pool, semantic index), both
+    # measured from a cold interpreter with a scratch database each time
+    import subprocess, statistics
+
+    samples = []
+    for _ in range(runs):
+        scratch = tempfile.mkdtemp(prefix="benchmark-startup-")
+        env = dict(
+            os.environ,
+            LLM_BACKEND="stub",
+            DATABASE_URL=f"sqlite+aiosqlite:///{os.path.join(scratch, 'chat.db')}",
+            SEMANTIC_CACHE_PATH=os.path.join(scratch, "semantic_cache.npz"),
+            SHARED_STATE_PATH=os.path.join(scratch, "shared_state.db"),
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT % LAZY_MODULES],
+            env=env, cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True,
+        ).stdout
+        samples.append(json.loads(output.splitlines()[-1]))
+
+    result = {
+        "import_ms": statistics.median(sample["import_ms"] for sample in samples),
+        "ready_ms": statistics.median(sample["ready_ms"] for sample in samples),
+        "loaded_at_import": sorted({name for sample in samples for name in sample["loaded"]}),
+    }
+    print(f"{runs} cold starts (median ms): import {result['import_ms']:.1f}, ready {result['ready_ms']:.1f}")
+    print(f"heavy modules loaded by import: {', '.join(result['loaded_at_import']) or 'none'}")
+    return {"startup": result}
+
+def compare(results, baseline, tolerance):
+    # prints every metric that moved and returns the regressions past tolerance
+    regressions = []
+    print(f"\n{'case':<30}{'metric':<18}{'baseline':>10}{'current':>10}{'change':>9}")
+    for case, result in results.items():
+        previous = baseline.get(case)
+        if previous is None:
+            print(f"{case:<30}not in baseline")
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            if flag:
+                regressions.append((case, metric))
+            print(f"{case:<30}{metric:<18}{old:>10.1f}{new:>10.1f}{change:>+9.0%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API endpoints against the in-process stub LLM")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint and concurrency level")
+    parser.add_argument("--stub-latency", type=float, default=0.05, help="seconds per stub completion")
+    parser.add_argument("--pdfs", help="directory of sample PDFs; a synthetic corpus is generated when omitted")
+    parser.add_argument("--corpus-size", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file from an earlier --save to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="relative change counted as a regression")
+    parser.add_argument("--extraction", action="store_true", help="run the tag extraction micro-benchmarks instead")
+    parser.add_argument("--startup", action="store_true", help="measure cold import and startup time instead")
+    parser.add_argument("--startup-runs", type=int, default=10, help="cold starts to take the median of")
+    args = parser.parse_args()
+
+    if args.extraction:
+        extraction_benchmark([2, 8, 32], chunk_size=16, number=50)
+        return
+    if args.startup:
+        results = startup_benchmark(args.startup_runs)
+        settings = {"startup_runs": args.startup_runs}
+    else:
+        results, settings = run_endpoints(args)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "settings": settings,
+                "results": results,
+            }, file, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file)["results"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+def run_endpoints(args):
+    # configuration is read at import time, so it has to be in place before the app is imported
+    scratch = tempfile.mkdtemp(prefix="benchmark-")
+    os.environ["LLM_BACKEND"] = "stub"
+    os.environ["STUB_LLM_LATENCY"] = str(args.stub_latency)
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(scratch, 'chat.db')}"
+    os.environ["SEMANTIC_CACHE_PATH"] = os.path.join(scratch, "semantic_cache.npz")
+    os.environ["RESPONSE_CACHE_BACKEND"] = "memory"
+
+    corpus = load_corpus(args.pdfs) if args.pdfs else sample_corpus(args.corpus_size, args.seed)
+    print(f"stub latency {args.stub_latency * 1000:.0f} ms, {len(corpus)} PDFs, {args.requests} requests per level (times in ms)")
+    print_header()
+    results = asyncio.run(benchmark(args, corpus))
+    return results, {"stub_latency": args.stub_latency, "requests": args.requests, "corpus": len(corpus), "seed": args.seed}
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os, time, socket, asyncio, argparse, threading
+import fitz, httpx, uvicorn
+from app.helpers.stub_llm import stub_app, STUB_LLM_LATENCY
+
+# Drives /resume-review and /cover-letter-generator at increasing concurrency against the local stub
+# LLM, so it needs no API key or network. With non-blocking LLM calls, wall time per level should stay
+# close to one stub latency instead of growing with the number of concurrent requests.
+#
+#   python load_test.py --levels 1 8 32 64
+
+JOB_DESCRIPTION = "We are looking for a software engineer with strong Python experience and a background in building cloud-based web services."
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_stub_server():
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(stub_app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+def sample_pdf():
+    document = fitz.open()
+    page = document.new_page()
+    page.insert_text((72, 72), "Jane Doe\nSoftware Engineer\n5 years of Python, FastAPI and AWS experience.")
+    return document.tobytes()
+
+async def run_level(client, path, pdf_bytes, concurrency):
+    async def one():
+        started = time.perf_counter()
+        response = await client.post(
+            path,
+            files={"file": ("resume.pdf", pdf_bytes, "application/pdf")},
+            data={"job_description": JOB_DESCRIPTION, "no_cache": "true"},  # measure the LLM path, not cache hits
+        )
+        assert response.status_code == 200, response.text
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(one() for _ in range(concurrency))))
+    elapsed = time.perf_counter() - started
+    return elapsed, latencies[len(latencies) // 2]
+
+async def main(levels):
+    os.environ["ANTHROPIC_BASE_URL"] = start_stub_server()
+    os.environ.setdefault("ANTHROPIC_API_KEY", "stub")
+
+    from main import app
+
+    pdf_bytes = sample_pdf()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120) as client:
+        print(f"stub latency: {STUB_LLM_LATENCY:.2f}s")
+        print(f"{'endpoint':<26}{'concurrency':>12}{'wall (s)':>10}{'p50 (s)':>10}{'req/s':>10}{'serial (s)':>12}")
+        for path in ["/resume-review", "/cover-letter-generator"]:
+            for concurrency in levels:
+                elapsed, p50 = await run_level(client, path, pdf_bytes, concurrency)
+                print(f"{path:<26}{concurrency:>12}{elapsed:>10.2f}{p50:>10.2f}{concurrency / elapsed:>10.1f}{concurrency * STUB_LLM_LATENCY:>12.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrency load test against a local stub LLM")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 64])
+    args = parser.parse_args()
+    asyncio.run(main(args.levels))
@@ -1,12 +1,88 @@
-from fastapi import FastAPI
-from app import chatAi, cover_letter_generator, resume_review
+import os, time, logging
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager
+from app.helpers.llm import close_client
+from app.helpers.pdf import warm_pool, shutdown_pool
+from app.helpers.resume_ingest import resume_cache
+from app.helpers.response_cache import response_cache
+from app.helpers.semantic_cache import semantic_cache, load_index, save_index
+from app.helpers.scheduler import get_scheduler
+from app.helpers import call_policy, metrics
+from app.database import engine, migrate
+from app import chatAi, cover_letter_generator, resume_review, bulk_review
 
-app = FastAPI()
+# serve.py migrates once before starting its workers and turns this off for them
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() == "true"
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "30"))  # how long LLM calls in flight get to finish
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MIGRATE_ON_STARTUP:
+        await migrate()
+    await warm_pool()
+    # the index is only valid for the model and prompt version it was built with; reading the prompt is deferred to here
+    semantic_cache.version = chatAi.semantic_version()
+    await load_index()
+    yield
+    # requests have stopped arriving; let background work (deferred tags, abandoned streams) finish its LLM calls
+    if not await get_scheduler().drain(SHUTDOWN_DRAIN_SECONDS):
+        logger.warning("Shutting down with LLM calls still in flight after %.0f s", SHUTDOWN_DRAIN_SECONDS)
+    await save_index()
+    await close_client()
+    await engine.dispose()
+    shutdown_pool()
+
+app = FastAPI(lifespan=lifespan)
+
+@app.middleware("http")
+async def instrument(request: Request, call_next):
+    # stages recorded while serving the request (pdf, llm_*, db_commit) come back as a Server-Timing header;
+    # for streamed responses the timings stop when the headers are sent
+    timings = {}
+    token = metrics.current_timings.set(timings)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.current_timings.reset(token)
+    elapsed = time.perf_counter() - started
+
+    route = request.scope.get("route")
+    metrics.request_seconds.observe(elapsed, method=request.method, route=route.path if route else "unmatched", status=str(response.status_code))
+    response.headers["Server-Timing"] = metrics.server_timing({**timings, "total": elapsed})
+    return response
 
 app.include_router(chatAi.router, tags=["ChatAI"])
 app.include_router(cover_letter_generator.router, tags=["Cover Letter Generator"])
 app.include_router(resume_review.router, tags=["Resume Review"])
+app.include_router(bulk_review.router, tags=["Bulk Resume Review"])
 
 @app.get("/")
 def read_root():
-    return {"message": "Hello, FastAPI!"}
\ No newline at end of file
+    return {"message": "Hello, FastAPI!"}
+
+@app.get("/cache-stats")
+def cache_stats():
+    # hit rates of the generation caches (exact and near-duplicate) and the parsed-resume cache
+    return {
+        "data": {"responses": response_cache.stats(), "semantic": semantic_cache.stats(), "resumes": resume_cache.stats()},
+        "message": "Success",
+        "error": False
+    }
+
+@app.get("/scheduler-stats")
+async def scheduler_stats():
+    # LLM calls in flight and queued, queue wait percentiles, token bucket levels, and retry/hedge/circuit breaker counters
+    return {
+        "data": {**get_scheduler().stats(), "upstream": call_policy.stats()},
+        "message": "Success",
+        "error": False
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    # request and stage latency histograms, LLM tokens and estimated cost, in the Prometheus text format
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
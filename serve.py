@@ -0,0 +1,53 @@
+import os, asyncio, argparse
+
+# Production entry point: several uvicorn worker processes behind one port.
+#
+#   python serve.py --workers 4 --port 8000
+#
+# The schema is migrated once here, before any worker starts, instead of by every worker's lifespan. With more
+# than one worker the response cache, resume cache and LLM token buckets default to their SQLite backends so
+# all workers share them (a resume_id handed out by one worker works on the others, and the per-minute token
+# budgets apply to the whole host). On SIGTERM uvicorn stops accepting connections, gives open requests up to
+# --graceful-timeout seconds, then each worker waits up to SHUTDOWN_DRAIN_SECONDS for LLM calls still in
+# flight before closing its clients. LLM_MAX_CONCURRENCY, PDF_WORKERS and the near-duplicate index stay per
+# worker; each worker merges its index into the saved one on shutdown, so the next start loads all of them.
+# `uvicorn main:app` still runs a single process that migrates on startup.
+
+SHARED_BACKENDS = ["RESPONSE_CACHE_BACKEND", "RESUME_CACHE_BACKEND", "LLM_RATE_LIMIT_BACKEND"]
+
+async def migrate_once():
+    from app.database import engine, migrate
+
+    await migrate()
+    await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", "30")), help="seconds open requests get to finish on shutdown")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = parser.parse_args()
+
+    # settings are read when the app is imported, so they have to be in the environment the workers inherit
+    if args.workers > 1:
+        for name in SHARED_BACKENDS:
+            os.environ.setdefault(name, "sqlite")
+    asyncio.run(migrate_once())
+    os.environ["MIGRATE_ON_STARTUP"] = "false"
+
+    import uvicorn
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+        proxy_headers=True,
+    )
+
+if __name__ == "__main__":
+    main()
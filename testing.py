@@ -1,10 +1,40 @@
-import requests, json
+import os, sys, time, requests, json, pytest, shutil, asyncio, zipfile, sqlite3, threading, subprocess, tempfile
 from io import BytesIO
+
+# answer LLM calls from the in-process stub unless told otherwise, so the suite runs offline and for free
+os.environ.setdefault("LLM_BACKEND", "stub")
+os.environ.setdefault("STUB_LLM_LATENCY", "0")
+# the app's databases go to a scratch directory so a test run leaves the checked-in chat.db untouched
+SCRATCH = tempfile.mkdtemp(prefix="interviewgpt-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(SCRATCH, 'chat.db')}"
+os.environ["RESPONSE_CACHE_PATH"] = os.path.join(SCRATCH, "response_cache.db")
+os.environ["SHARED_STATE_PATH"] = os.path.join(SCRATCH, "shared_state.db")
+os.environ["SEMANTIC_CACHE_PATH"] = os.path.join(SCRATCH, "semantic_cache.npz")
+
 from main import app  
+from app.helpers.context import fit_history, estimate_tokens
+from app.helpers.response_cache import SQLiteBackend
+from app.helpers.semantic_cache import SemanticCache, SEMANTIC_CACHE_THRESHOLD
+from app.helpers.scheduler import Scheduler, SQLiteTokenBucket, INTERACTIVE, STANDARD, BACKGROUND
+from app.helpers import llm, stub_llm, call_policy, upload, metrics
+from app.helpers.re_helper import extract_tag, TagStripper
+from app.helpers.call_policy import breaker
+from app.helpers.review_parser import ReviewParser, ReviewParseError, parse_review
+from app.helpers import prompts
+from app import bulk_review, chatAi
+from app.database import SessionLocal, delete_conversation
 from fastapi.testclient import TestClient
 
 client = TestClient(app)
 
+@pytest.fixture(scope="module", autouse=True)
+def app_lifespan():
+    # run startup (schema migration) once and keep every request on the same event loop;
+    # the database and the near-duplicate index start empty in SCRATCH
+    with client:
+        yield
+    shutil.rmtree(SCRATCH, ignore_errors=True)
+
 URL = "http://127.0.0.1:8000"
 
 # ! Chat Bot tests
@@ -42,6 +72,116 @@ def test_create_conversation():
     messages = data['data']['messages']
     validate_message_structure(messages)
     
+def test_create_conversation_prompt_cache():
+    url = URL + "/create-conversation"
+    
+    # the system prompt and examples are a cached prefix, so a second request reads them from the cache
+    client.post(url, json={"prompt": "How do I negotiate a job offer?"})
+    response = client.post(url, json={"prompt": "How do I follow up after an interview?"})
+    
+    assert response.status_code == 200
+    
+    usage = response.json()["usage"]
+    for key in ["input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"]:
+        assert isinstance(usage[key], int), f"usage missing {key}"
+    assert usage["cache_read_input_tokens"] > 0
+
+def test_create_conversation_deferred_tag():
+    url = URL + "/create-conversation"
+    payload = {"prompt": "How should I prepare for a system design interview?", "defer_tag": True}
+    
+    response = client.post(url, json=payload)
+    
+    assert response.status_code == 200
+    
+    data = response.json()
+    
+    assert data["error"] == False
+    assert data["data"]["tag"] is None
+    validate_message_structure(data["data"]["messages"])
+    
+    # TestClient runs background tasks before returning, so the tag is filled in by now
+    get_response = client.post(URL + "/get-conversation", json={"conversation_id": data["data"]["conversation_id"]})
+    
+    assert get_response.status_code == 200
+    assert get_response.json()["data"]["tag"]
+    
+def parse_sse(body):
+    """Helper function to split an SSE body into (event, data) pairs"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_create_conversation_stream():
+    url = URL + "/create-conversation/stream"
+    payload = {"prompt": "How should I prepare for a coding interview?"}
+    
+    response = client.post(url, json=payload)
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    
+    events = parse_sse(response.text)
+    event, done = events[-1]
+    
+    assert event == "done"
+    assert done["error"] == False
+    assert all(event == "delta" for event, _ in events[:-1])
+    
+    # the streamed deltas add up to the stored answer, without the <answer> wrapper
+    streamed = "".join(data["text"] for _, data in events[:-1])
+    messages = done["data"]["messages"]
+    validate_message_structure(messages)
+    assert messages[1]["content"] == streamed
+    assert "<answer>" not in streamed
+
+def test_update_conversation_stream():
+    create_response = client.post(URL + "/create-conversation", json={"prompt": "What are common coding interview questions?"})
+    conversation_id = create_response.json()["data"]["conversation_id"]
+    
+    url = URL + "/update-conversation/stream"
+    payload = {"conversation_id": conversation_id, "prompt": "Can you give more specific examples?"}
+    
+    response = client.put(url, json=payload)
+    
+    assert response.status_code == 200
+    
+    event, done = parse_sse(response.text)[-1]
+    assert event == "done"
+    assert done["error"] == False
+    
+    get_response = client.post(URL + "/get-conversation", json={"conversation_id": conversation_id})
+    messages = get_response.json()["data"]["messages"]
+    
+    validate_message_structure(messages)
+    assert len(messages) == 4
+    assert messages[-1]["content"] == done["data"]
+
+def test_update_nonexistent_conversation_stream():
+    response = client.put(URL + "/update-conversation/stream", json={"conversation_id": 999999, "prompt": "This conversation doesn't exist"})
+    
+    assert response.status_code == 404
+    assert response.json()["message"] == "Conversation not found"
+
+def test_context_budget_keeps_history_flat():
+    history = []
+    for i in range(50):
+        history += [
+            {"role": "user", "content": f"Question {i} about system design interviews"},
+            {"role": "assistant", "content": "A long answer. " * 400}
+        ]
+    
+    short = fit_history(history[:4], 5000)
+    trimmed = fit_history(history, 5000)
+    
+    assert short == history[:4]
+    assert sum(estimate_tokens(message["content"]) for message in trimmed) <= 5000
+    validate_message_structure(trimmed[2:])
+    assert trimmed[-1] == history[-1]
+    assert "<conversation_summary>" in trimmed[0]["content"][0]["text"]
+
 def test_get_conversation():
     url = URL + "/create-conversation"
     payload = {"prompt": "How do I answer behavioral questions?"}
@@ -60,6 +200,100 @@ def test_get_conversation():
     assert data["error"] == False
     assert data["data"]["conversation_id"] == conversation_id
 
+def test_get_conversation_pages():
+    create_response = client.post(URL + "/create-conversation", json={"prompt": "How do I answer behavioral questions?"})
+    conversation_id = create_response.json()["data"]["conversation_id"]
+    client.put(URL + "/update-conversation", json={"conversation_id": conversation_id, "prompt": "Give me an example."})
+    
+    url = URL + "/get-conversation"
+    pages = []
+    after_seq = None
+    while True:
+        response = client.post(url, json={"conversation_id": conversation_id, "after_seq": after_seq, "limit": 3})
+        assert response.status_code == 200
+        data = response.json()["data"]
+        pages.append(data["messages"])
+        after_seq = data["next_after_seq"]
+        if after_seq is None:
+            break
+    
+    assert [len(page) for page in pages] == [3, 1]
+    validate_message_structure([message for page in pages for message in page])
+    
+    for bad_page in [{"limit": -1}, {"limit": 0}, {"limit": 101}, {"after_seq": -2}]:
+        assert client.post(url, json={"conversation_id": conversation_id, **bad_page}).status_code == 422
+
+def test_list_conversations():
+    ids = [client.post(URL + "/create-conversation", json={"prompt": prompt}).json()["data"]["conversation_id"] for prompt in [
+        "How do I explain a gap in my resume?",
+        "What is a good answer to why do you want to leave your job?",
+        "How do I talk about a failed project?",
+    ]]
+    
+    first_page = client.post(URL + "/conversations", json={"limit": 2}).json()
+    
+    assert first_page["error"] == False
+    assert [row["conversation_id"] for row in first_page["data"]] == ids[:0:-1]
+    assert all(row["message_count"] == 2 for row in first_page["data"])
+    assert first_page["next_cursor"]
+    
+    second_page = client.post(URL + "/conversations", json={"limit": 2, "cursor": first_page["next_cursor"]}).json()
+    assert second_page["data"][0]["conversation_id"] == ids[0]
+    
+    # a new turn moves the conversation back to the top and bumps its count
+    client.put(URL + "/update-conversation", json={"conversation_id": ids[0], "prompt": "Can you give an example?"})
+    top = client.post(URL + "/conversations", json={"limit": 1}).json()["data"][0]
+    assert top["conversation_id"] == ids[0]
+    assert top["message_count"] == 4
+
+def test_list_conversations_invalid_cursor():
+    response = client.post(URL + "/conversations", json={"cursor": "not-a-cursor"})
+    
+    assert response.status_code == 400
+    assert response.json()["error"] == True
+
+def test_search_conversations():
+    conversation_id = client.post(URL + "/create-conversation", json={"prompt": "How do I describe kubernetes migrations in an interview?"}).json()["data"]["conversation_id"]
+    
+    response = client.post(URL + "/search-conversations", json={"query": "Kubernetes migration"})
+    
+    assert response.status_code == 200
+    results = response.json()["data"]
+    assert results[0]["conversation_id"] == conversation_id
+    assert results[0]["seq"] == 0
+    assert "<mark>" in results[0]["snippet"]
+    assert len({result["conversation_id"] for result in results}) == len(results)
+    
+    # new turns are searchable right away, and deleted conversations drop out of the index
+    client.put(URL + "/update-conversation", json={"conversation_id": conversation_id, "prompt": "What about helm charts?"})
+    assert client.post(URL + "/search-conversations", json={"query": "helm"}).json()["data"][0]["conversation_id"] == conversation_id
+    
+    client.request("DELETE", URL + "/delete-conversation", json={"conversation_id": conversation_id})
+    assert client.post(URL + "/search-conversations", json={"query": "kubernetes helm"}).json()["data"] == []
+
+def test_search_conversations_rejects_empty_query():
+    response = client.post(URL + "/search-conversations", json={"query": "\"*()"})
+    
+    assert response.status_code == 400
+
+def test_concurrent_appends_keep_every_turn():
+    from app.database import SessionLocal, create_conversation, append_messages, get_messages
+    
+    async def run():
+        async with SessionLocal() as db:
+            conversation_id = (await create_conversation(db, "concurrency", [{"role": "user", "content": "q"}, {"role": "assistant", "content": "a"}])).conversation_id
+        
+        async def append(i):
+            async with SessionLocal() as db:
+                await append_messages(db, conversation_id, [{"role": "user", "content": f"q{i}"}, {"role": "assistant", "content": f"a{i}"}])
+        
+        await asyncio.gather(*(append(i) for i in range(8)))
+        
+        async with SessionLocal() as db:
+            return [message.seq for message in await get_messages(db, conversation_id)]
+    
+    assert client.portal.call(run) == list(range(18))
+
 def test_get_nonexistent_conversation():
     url = URL + "/get-conversation"
     payload = {"conversation_id": 999999}
@@ -135,6 +369,21 @@ def test_delete_conversation():
     assert get_response.status_code == 404
     assert get_response.json()["error"] == True
 
+def test_update_deleted_conversation(monkeypatch):
+    conversation_id = client.post(URL + "/create-conversation", json={"prompt": "How do I prepare for a coding interview?"}).json()["data"]["conversation_id"]
+    create_message = chatAi.create_message
+    
+    async def deleted_while_answering(*args, **kwargs):
+        response = await create_message(*args, **kwargs)
+        async with SessionLocal() as db:
+            await delete_conversation(db, conversation_id)
+        return response
+    monkeypatch.setattr(chatAi, "create_message", deleted_while_answering)
+    
+    response = client.put(URL + "/update-conversation", json={"conversation_id": conversation_id, "prompt": "Give me an example."})
+    assert response.status_code == 404
+    assert response.json()["message"] == "Conversation not found"
+
 def test_delete_nonexistent_conversation():
     response = client.request(
         method="DELETE",
@@ -154,6 +403,739 @@ def test_invalid_conversation_id_format():
     
     assert response.status_code == 422
 
+def make_pdf(pages):
+    """Helper function to build an in-memory PDF with the given number of pages"""
+    import fitz
+    document = fitz.open()
+    for i in range(pages):
+        document.new_page().insert_text((72, 72), f"Jane Doe - Software Engineer - page {i + 1}")
+    return document.tobytes()
+
+def make_scanned_pdf():
+    """Helper function to build a PDF whose first page is an image with no text layer"""
+    import fitz
+    from PIL import Image, ImageDraw, ImageFont
+    image = Image.new("RGB", (1200, 300), "white")
+    ImageDraw.Draw(image).text((40, 100), "Jane Doe Software Engineer", fill="black", font=ImageFont.load_default(size=64))
+    buffer = BytesIO()
+    image.save(buffer, "PNG")
+    document = fitz.open()
+    page = document.new_page()
+    page.insert_image(page.rect, stream=buffer.getvalue())
+    document.new_page().insert_text((72, 72), "Experience: five years of Python and FastAPI.")
+    return document.tobytes()
+
+def test_scanned_pages_are_detected():
+    from app.helpers.pdf import extract_pages
+    
+    texts, scans = extract_pages(make_scanned_pdf(), max_pages=10, ocr_pages=3)
+    
+    assert len(texts) == 2
+    assert list(scans) == [0], "only the image-only page should be queued for OCR"
+    
+    _, capped = extract_pages(make_scanned_pdf(), max_pages=10, ocr_pages=0)
+    assert capped == {}
+
+@pytest.mark.skipif(shutil.which("tesseract") is None, reason="tesseract binary not installed")
+def test_scanned_resume_is_ocrd():
+    from app.helpers.pdf import extract_text
+    
+    text, _ = client.portal.call(extract_text, make_scanned_pdf())
+    
+    assert "jane doe" in text.lower()
+    assert "five years of python" in text.lower()
+
+def test_resume_review_rejects_too_many_pages():
+    from app.helpers.pdf import PDF_MAX_PAGES
+    
+    response = client.post(
+        URL + "/resume-review",
+        files={"file": ("resume.pdf", BytesIO(make_pdf(PDF_MAX_PAGES + 1)), "application/pdf")},
+        data={"job_description": "Software Engineer position with 5+ years of experience in Python."},
+    )
+    
+    assert response.status_code == 400
+    assert response.json()["error"] == True
+    assert "limit" in response.json()["message"]
+
+def test_resume_id_reused_across_pdf_endpoints():
+    job_description = "We are looking for a talented software engineer with expertise in Python and experience with cloud-based systems."
+    
+    review_response = client.post(
+        URL + "/resume-review",
+        files={"file": ("resume.pdf", BytesIO(make_pdf(1)), "application/pdf")},
+        data={"job_description": job_description},
+    )
+    
+    assert review_response.status_code == 200
+    resume_id = review_response.json()["resume_id"]
+    
+    # the second endpoint gets only the id; the parsed text comes from the shared cache
+    letter_response = client.post(
+        URL + "/cover-letter-generator",
+        data={"job_description": job_description, "resume_id": resume_id},
+    )
+    
+    assert letter_response.status_code == 200
+    assert letter_response.json()["error"] == False
+    assert letter_response.json()["resume_id"] == resume_id
+    assert "pdf;" not in letter_response.headers["server-timing"]  # nothing was parsed
+
+def test_oversized_upload_is_rejected_before_parsing():
+    job_description = "We are looking for a talented software engineer with expertise in Python and experience with cloud-based systems."
+    
+    response = client.post(
+        URL + "/resume-review",
+        files={"file": ("resume.pdf", b"%PDF-1.7\n" + b"0" * (upload.UPLOAD_MAX_BYTES + 1), "application/pdf")},
+        data={"job_description": job_description},
+    )
+    
+    assert response.status_code == 400
+    assert "larger than" in response.json()["message"]
+    
+    response = client.post(
+        URL + "/resume-review",
+        files={"file": ("resume.pdf", b"<html>not a pdf</html>" * 100, "application/pdf")},
+        data={"job_description": job_description},
+    )
+    
+    assert response.status_code == 400
+    assert response.json()["message"] == "File isn't a valid PDF"
+
+def test_invalid_job_description_is_rejected_while_streaming():
+    response = client.post(
+        URL + "/cover-letter-generator",
+        files={"file": ("resume.pdf", make_pdf(1), "application/pdf")},
+        data={"job_description": "Too short"},
+    )
+    
+    assert response.status_code == 400
+    assert response.json()["message"].startswith("Job description should be in the range")
+
+def test_large_upload_spools_to_disk(monkeypatch, tmp_path):
+    import hashlib, tempfile
+    monkeypatch.setattr(upload, "UPLOAD_SPOOL_BYTES", 64)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    pdf_bytes = make_pdf(2)
+    
+    response = client.post(
+        URL + "/resume-review",
+        files={"file": ("resume.pdf", pdf_bytes, "application/pdf")},
+        data={"job_description": "We are looking for a talented software engineer with expertise in Python and experience with cloud-based systems.", "no_cache": "true"},
+    )
+    
+    assert response.status_code == 200
+    assert response.json()["resume_id"] == hashlib.sha256(pdf_bytes).hexdigest()  # hashed while streaming
+    assert list(tmp_path.iterdir()) == []  # the spooled file is removed once parsed
+
+def test_spooled_pdf_writes_off_the_loop(monkeypatch, tmp_path):
+    import tempfile
+    monkeypatch.setattr(upload, "UPLOAD_SPOOL_BYTES", 64)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    pdf_bytes = make_pdf(2)
+    spooled = upload.SpooledPDF()
+    
+    async def exercise():
+        for index in range(0, len(pdf_bytes), 100):
+            spooled.write(pdf_bytes[index:index + 100])
+        # past the spool size the chunks only queue up; the file is created and written by spill() in a thread
+        assert spooled.file is None and spooled.pending_bytes == len(pdf_bytes)
+        spooled.finish()
+        await spooled.spill(close=True)
+    
+    asyncio.run(exercise())
+    with open(spooled.source(), "rb") as file:
+        assert file.read() == pdf_bytes
+    spooled.discard()
+    assert list(tmp_path.iterdir()) == []
+
+REVIEW_TEXT = json.dumps(stub_llm.REVIEW_RESPONSE)
+
+def test_review_parser_unwraps_fenced_reply():
+    review, complete = parse_review("Here is the review:\n```json\n" + REVIEW_TEXT + "\n```\nLet me know if you need more.")
+
+    assert complete
+    assert review.model_dump() == stub_llm.REVIEW_RESPONSE
+
+def test_review_parser_salvages_truncated_reply():
+    # cut off inside the third category: the first two are kept and the scores are clamped into 0-100
+    text = REVIEW_TEXT.replace('"score": 70', '"score": 140', 1)
+    cut = text.index('"name"', text.index('"name"', text.index('"name"') + 1) + 1) + 12
+    review, complete = parse_review(text[:cut])
+
+    assert not complete
+    assert [category.name for category in review.categories_and_improvements] == [category["name"] for category in stub_llm.REVIEW_RESPONSE["categories_and_improvements"][:2]]
+    assert review.categories_and_improvements[0].score == 100
+
+    with pytest.raises(ReviewParseError):
+        parse_review('{"categories_and_improvements": [{"name": "Con')
+
+@pytest.mark.parametrize("score", ["null", "[1]", "Infinity", "NaN", '"high"'])
+def test_review_parser_drops_category_with_bad_score(score):
+    categories = stub_llm.REVIEW_RESPONSE["categories_and_improvements"]
+    review, complete = parse_review(REVIEW_TEXT.replace('"score": 70', f'"score": {score}', 1))
+
+    assert not complete
+    assert [category.name for category in review.categories_and_improvements] == [category["name"] for category in categories[1:]]
+
+def test_review_parser_skips_invalid_escape():
+    # the category with the bad string is dropped and the rest of the review is salvaged
+    categories = stub_llm.REVIEW_RESPONSE["categories_and_improvements"]
+    text = REVIEW_TEXT.replace(json.dumps(categories[1]["name"]), '"Bad \\q escape"', 1)
+    review, complete = parse_review(text)
+
+    assert not complete
+    assert [category.name for category in review.categories_and_improvements] == [category["name"] for category in categories if category is not categories[1]]
+    assert review.feedback == stub_llm.REVIEW_RESPONSE["feedback"]
+
+    with pytest.raises(ReviewParseError):
+        parse_review('{"categories_and_improvements": [{"name": "\\q", "score": 1, "suggestions": []}]}')
+
+def test_review_parser_emits_categories_incrementally():
+    parser = ReviewParser()
+    completed = [len(parser.feed(REVIEW_TEXT[index:index + 7])) for index in range(0, len(REVIEW_TEXT), 7)]
+
+    # every category is handed out exactly once, before the rest of the reply has arrived
+    assert sum(completed) == len(stub_llm.REVIEW_RESPONSE["categories_and_improvements"])
+    assert completed.index(1) < len(completed) // 2
+    assert parser.finish()[1]
+
+def test_resume_review_stream():
+    response = client.post(
+        URL + "/resume-review/stream",
+        files={"file": ("resume.pdf", make_pdf(1), "application/pdf")},
+        data={"job_description": "We are looking for a talented software engineer with expertise in Python and experience with cloud-based systems."},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(response.text)
+    event, done = events[-1]
+
+    assert event == "done"
+    assert done["error"] == False
+    assert done["partial"] == False
+    assert [event for event, _ in events[:-1]] == ["category"] * len(done["data"]["categories_and_improvements"])
+    assert [data["data"] for _, data in events[:-1]] == done["data"]["categories_and_improvements"]
+
+def test_unknown_resume_id():
+    response = client.post(
+        URL + "/resume-review",
+        data={"job_description": "Software Engineer position with 5+ years of experience in Python.", "resume_id": "0" * 64},
+    )
+    
+    assert response.status_code == 404
+    assert response.json()["error"] == True
+
+def test_response_cache():
+    url = URL + "/create-conversation"
+    
+    first = client.post(url, json={"prompt": "What should I ask the interviewer at the end?"})
+    # case and whitespace are normalized away, so this is the same cache entry
+    second = client.post(url, json={"prompt": "what should I ask  the interviewer\nat the end?"})
+    bypass = client.post(url, json={"prompt": "What should I ask the interviewer at the end?", "no_cache": True})
+    
+    assert first.json()["cached"] == False
+    assert second.json()["cached"] == True
+    assert second.json()["usage"]["output_tokens"] == 0
+    assert second.json()["data"]["messages"][1] == first.json()["data"]["messages"][1]
+    assert second.json()["data"]["conversation_id"] != first.json()["data"]["conversation_id"]
+    assert bypass.json()["cached"] == False
+    
+    stats = client.get(URL + "/cache-stats").json()["data"]["responses"]
+    assert stats["hits"] >= 1
+    assert stats["bypassed"] >= 1
+    assert 0 < stats["hit_rate"] <= 1
+
+def test_sqlite_response_cache(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "responses.db"), max_entries=2, ttl=60)
+    
+    async def exercise():
+        await backend.set("a", {"answer": 1})
+        await backend.set("b", {"answer": 2})
+        assert await backend.get("a") == {"answer": 1}  # a is now more recently used than b
+        await backend.set("c", {"answer": 3})
+        return [await backend.get(key) for key in ["a", "b", "c"]]
+    
+    assert asyncio.run(exercise()) == [{"answer": 1}, None, {"answer": 3}]
+    
+    expired = SQLiteBackend(str(tmp_path / "expired.db"), max_entries=2, ttl=-1)
+    asyncio.run(expired.set("a", "stale"))
+    assert asyncio.run(expired.get("a")) is None
+
+def test_shared_state_across_workers(tmp_path):
+    # two instances over one file stand in for two worker processes
+    path = str(tmp_path / "shared_state.db")
+    first, second = SQLiteBackend(path, 10, 60, table="resume_cache"), SQLiteBackend(path, 10, 60, table="resume_cache")
+    asyncio.run(first.set("resume", "Resume text"))
+    assert asyncio.run(second.get("resume")) == "Resume text"
+
+    async def buckets():
+        bucket, other = SQLiteTokenBucket(600, "input", path), SQLiteTokenBucket(600, "input", path)
+        bucket.take(600)
+        await bucket.flush()
+        await other.flush()
+        assert other.wait_time(300) > 25  # the budget is spent for both
+        other.give_back(300)
+        await other.flush()
+        await bucket.sync()
+        assert bucket.wait_time(300) < 1
+
+    asyncio.run(buckets())
+
+def test_shared_token_bucket_stays_off_the_event_loop(tmp_path, monkeypatch):
+    bucket = SQLiteTokenBucket(600, "output", str(tmp_path / "shared_state.db"))
+    connect, threads = sqlite3.connect, []
+    monkeypatch.setattr(sqlite3, "connect", lambda *args, **kwargs: threads.append(threading.get_ident()) or connect(*args, **kwargs))
+    
+    async def exercise():
+        # what dispatch() calls only touches the local copy; the row is written from a worker thread
+        assert bucket.wait_time(100) == 0
+        bucket.take(100)
+        bucket.give_back(50)
+        assert 540 <= bucket.tokens <= 600
+        await bucket.flush()
+    
+    asyncio.run(exercise())
+    assert threads and threading.get_ident() not in threads
+    assert 540 <= connect(bucket.path).execute("SELECT tokens FROM token_buckets").fetchone()[0] <= 600
+
+def test_shared_token_bucket_unreachable_store(tmp_path, monkeypatch):
+    bucket = SQLiteTokenBucket(600, "input", str(tmp_path / "missing" / "shared_state.db"))
+    bucket.SYNC_INTERVAL = 0.05
+    apply, attempts = bucket.apply, []
+    monkeypatch.setattr(bucket, "apply", lambda change: attempts.append(change) or apply(change))
+    
+    async def exercise():
+        bucket.take(100)
+        await asyncio.sleep(0.5)
+        # a few spaced retries, then the worker keeps limiting with its own copy
+        assert len(attempts) == bucket.SYNC_ATTEMPTS
+        assert bucket.syncing is None and bucket.pending == -100
+        assert bucket.wait_time(600) > 0
+        
+        # shutdown gives up after the timeout instead of waiting on the store
+        bucket.SYNC_INTERVAL = 10
+        started = time.monotonic()
+        await bucket.flush(0.2)
+        return time.monotonic() - started
+    
+    assert asyncio.run(exercise()) < 1
+
+def test_scheduler_drains_calls_in_flight():
+    async def exercise():
+        scheduler = Scheduler(4, {}, 0, 0)
+
+        async def call():
+            async with scheduler.slot("chat"):
+                await asyncio.sleep(0.2)
+
+        task = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        assert not await scheduler.drain(0.05)
+        drained = await scheduler.drain(5)
+        return drained, task.done()
+
+    assert asyncio.run(exercise()) == (True, True)
+
+def test_scheduler_cancel_while_dispatching():
+    async def exercise():
+        scheduler = Scheduler(1, {}, 0, 0)
+        await scheduler.acquire("chat", INTERACTIVE, 0, 0)
+        waiter = asyncio.create_task(scheduler.acquire("chat", INTERACTIVE, 0, 0))
+        await asyncio.sleep(0)
+        
+        # the release dispatches in the same tick and drops the cancelled entry before the waiter runs
+        waiter.cancel()
+        scheduler.release("chat")
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return scheduler.active, len(scheduler.queue)
+
+    assert asyncio.run(exercise()) == (0, 0)
+
+def test_semantic_cache_serves_reworded_prompt():
+    url = URL + "/create-conversation"
+    
+    first = client.post(url, json={"prompt": "How do I answer the greatest weakness question?"})
+    reworded = client.post(url, json={"prompt": "how to answer greatest weaknesses question"})
+    different = client.post(url, json={"prompt": "How do I answer the greatest strength question?"})
+    
+    assert first.json()["cached"] == False
+    assert reworded.json()["cached"] == True
+    assert reworded.json()["data"]["tag"] == first.json()["data"]["tag"]
+    assert different.json()["cached"] == False
+    
+    assert client.get(URL + "/cache-stats").json()["data"]["semantic"]["hits"] >= 1
+
+def test_semantic_cache_serves_spelling_variant():
+    index = SemanticCache("unused.npz", SEMANTIC_CACHE_THRESHOLD, max_entries=10)
+    index.add("how do I answer behavioral questions?", "answer")
+    
+    assert index.lookup("How to answer behavioural questions")[0] == "answer"
+
+@pytest.mark.parametrize("prompt, swapped", [
+    ("How should I prepare for a technical interview for a Unity Developer position at Rockstar Games with five years of C# experience?", ("Rockstar", "Ubisoft")),
+    ("What salary should I ask for as a junior engineer?", ("junior", "senior")),
+    ("How should I prepare for a backend engineer interview at Stripe?", ("backend", "frontend")),
+])
+def test_semantic_cache_rejects_entity_swap(prompt, swapped):
+    index = SemanticCache("unused.npz", SEMANTIC_CACHE_THRESHOLD, max_entries=10)
+    index.add(prompt, "answer")
+    
+    value, similarity = index.lookup(prompt.replace(*swapped))
+    assert value is None
+    # the embeddings alone can't tell these apart; the content-word check does
+    assert similarity >= SEMANTIC_CACHE_THRESHOLD
+    assert index.rejected == 1
+
+def test_semantic_cache_index_round_trip(tmp_path):
+    index = SemanticCache(str(tmp_path / "index.npz"), threshold=0.88, max_entries=2)
+    for value, prompt in enumerate(["tell me about yourself", "salary negotiation tips", "system design interview"]):
+        index.add(prompt, value)
+    index.save()
+    
+    reloaded = SemanticCache(index.path, threshold=0.88, max_entries=2)
+    reloaded.load()
+    
+    # the oldest prompt was overwritten once the index was full
+    assert reloaded.lookup("tell me about yourself")[0] is None
+    assert reloaded.lookup("System design interviews")[0] == 2
+
+def test_semantic_cache_workers_merge_on_save(tmp_path):
+    path = str(tmp_path / "index.npz")
+    first, second = SemanticCache(path, 0.88, max_entries=10), SemanticCache(path, 0.88, max_entries=10)
+    first.add("tell me about yourself", "first")
+    second.add("salary negotiation tips", "second")
+    first.save()
+    second.save()
+    
+    reloaded = SemanticCache(path, 0.88, max_entries=10)
+    reloaded.load()
+    assert reloaded.lookup("Tell me about yourself")[0] == "first"
+    assert reloaded.lookup("salary negotiation tips")[0] == "second"
+
+def test_bulk_resume_review():
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w") as bundle:
+        bundle.writestr("zipped.pdf", make_pdf(1))
+        bundle.writestr("broken.pdf", b"not a pdf")
+        bundle.writestr("notes.txt", b"ignored")
+    
+    response = client.post(
+        URL + "/resume-review/bulk",
+        files=[
+            ("files", ("first.pdf", BytesIO(make_pdf(1)), "application/pdf")),
+            ("files", ("second.pdf", BytesIO(make_pdf(2)), "application/pdf")),
+            ("files", ("bundle.zip", archive.getvalue(), "application/zip")),
+        ],
+        data={"job_description": "We are looking for a backend engineer with Python and AWS experience."},
+    )
+    
+    assert response.status_code == 202
+    job = response.json()["data"]
+    assert job["total"] == 4
+    assert job["submitted"] == 3
+    
+    # poll until the batch has ended
+    for _ in range(50):
+        status = client.get(URL + f"/resume-review/bulk/{job['job_id']}").json()["data"]
+        if status["status"] == "ended":
+            break
+        time.sleep(0.1)
+    
+    results = {result["filename"]: result for result in status["results"]}
+    assert set(results) == {"first.pdf", "second.pdf", "zipped.pdf", "broken.pdf"}
+    assert "categories_and_improvements" in results["first.pdf"]["data"]
+    assert results["zipped.pdf"]["resume_id"]
+    assert results["broken.pdf"]["data"] is None
+    assert results["broken.pdf"]["error"]
+
+def test_bulk_resume_review_corrupt_zip_entry():
+    good, corrupt = make_pdf(1), make_pdf(2)
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as bundle:
+        bundle.writestr("good.pdf", good)
+        bundle.writestr("corrupt.pdf", corrupt)
+    data = bytearray(archive.getvalue())
+    data[data.find(corrupt) + 100] ^= 0xFF  # fails the CRC check when read
+    
+    response = client.post(
+        URL + "/resume-review/bulk",
+        files=[("files", ("bundle.zip", bytes(data), "application/zip"))],
+        data={"job_description": "We are looking for a backend engineer with Python and AWS experience."},
+    )
+    
+    assert response.status_code == 202
+    job = response.json()["data"]
+    assert (job["total"], job["submitted"]) == (2, 1)
+
+def test_bulk_resume_review_byte_budget(monkeypatch):
+    pdfs = [make_pdf(pages) for pages in [1, 2, 3]]
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w") as bundle:
+        for index, pdf in enumerate(pdfs):
+            bundle.writestr(f"resume-{index}.pdf", pdf)
+    # room for the first two PDFs only
+    monkeypatch.setattr(bulk_review, "BULK_MAX_BYTES", len(pdfs[0]) + len(pdfs[1]))
+    monkeypatch.setattr(bulk_review, "BULK_PARSE_CONCURRENCY", 1)
+    
+    response = client.post(
+        URL + "/resume-review/bulk",
+        files=[("files", ("bundle.zip", archive.getvalue(), "application/zip"))],
+        data={"job_description": "We are looking for a backend engineer with Python and AWS experience."},
+    )
+    
+    assert response.status_code == 202
+    job = response.json()["data"]
+    assert (job["total"], job["submitted"]) == (3, 2)
+    
+    for _ in range(50):
+        status = client.get(URL + f"/resume-review/bulk/{job['job_id']}").json()["data"]
+        if status["status"] == "ended":
+            break
+        time.sleep(0.1)
+    assert "MB limit" in status["results"][2]["error"]
+
+def test_bulk_resume_review_unknown_job():
+    assert client.get(URL + "/resume-review/bulk/missing").status_code == 404
+
+def test_scheduler_serves_higher_priority_first():
+    async def exercise():
+        scheduler = Scheduler(1, {}, 0, 0)
+        order = []
+        
+        async def call(name, endpoint, priority):
+            async with scheduler.slot(endpoint, priority):
+                order.append(name)
+                await asyncio.sleep(0.01)
+        
+        # "first" holds the only slot while the rest queue up in the opposite order of their priority
+        first = asyncio.create_task(call("first", "bulk", BACKGROUND))
+        await asyncio.sleep(0)
+        await asyncio.gather(first, call("bulk", "bulk", BACKGROUND), call("review", "resume_review", STANDARD), call("chat", "chat", INTERACTIVE))
+        return order
+    
+    assert asyncio.run(exercise()) == ["first", "chat", "review", "bulk"]
+
+def test_scheduler_endpoint_cap_and_token_bucket():
+    async def exercise():
+        scheduler = Scheduler(10, {"bulk": 1}, 6000, 0)
+        running = {"bulk": 0, "peak": 0}
+        
+        async def bulk_call():
+            async with scheduler.slot("bulk"):
+                running["bulk"] += 1
+                running["peak"] = max(running["peak"], running["bulk"])
+                await asyncio.sleep(0.01)
+                running["bulk"] -= 1
+        
+        await asyncio.gather(*(bulk_call() for _ in range(3)))
+        
+        # the first call drains the 6000 token/minute bucket; 50 more tokens take about half a second to refill
+        async with scheduler.slot("chat", input_tokens=6000):
+            pass
+        started = time.monotonic()
+        async with scheduler.slot("chat", input_tokens=50):
+            pass
+        return running["peak"], time.monotonic() - started, scheduler.stats()
+    
+    peak, waited, stats = asyncio.run(exercise())
+    assert peak == 1
+    assert waited >= 0.4
+    assert stats["completed"] == 5
+    assert stats["queued"] == 0
+
+def test_metrics_and_server_timing():
+    response = client.post(URL + "/create-conversation", json={"prompt": "How do I describe my biggest achievement?", "no_cache": True})
+    
+    assert response.status_code == 200
+    stages = dict(timing.split(";dur=") for timing in response.headers["server-timing"].split(", "))
+    for stage in ["llm_chat", "llm_tag", "db_commit", "total"]:
+        assert float(stages[stage]) >= 0, f"Server-Timing missing {stage}"
+    
+    metrics_response = client.get(URL + "/metrics")
+    
+    assert metrics_response.status_code == 200
+    assert metrics_response.headers["content-type"].startswith("text/plain")
+    body = metrics_response.text
+    assert 'interviewgpt_request_duration_seconds_count{method="POST",route="/create-conversation",status="200"}' in body
+    assert 'interviewgpt_stage_duration_seconds_bucket{stage="llm_chat",le="+Inf"}' in body
+    assert 'interviewgpt_llm_tokens_total{endpoint="chat"' in body
+    assert "interviewgpt_llm_cost_usd_total" in body
+    assert 'interviewgpt_tag_extractions_total{tag="answer",outcome="matched"}' in body
+
+@pytest.mark.parametrize("reply, expected, outcome", [
+    ("Sure.\n<answer>Practice out loud</answer>\nGood luck!", "Practice out loud", "matched"),
+    ("<answer>First part</answer> and <answer>second part</answer>", "First part\n\nsecond part", "matched"),
+    ("<answer>Wrap it as <answer>example</answer> here</answer>", "Wrap it as <answer>example</answer> here", "matched"),
+    ("<answer>Cut off by max_tok", "Cut off by max_tok", "unterminated"),
+    ("No tags at all", "No tags at all", "missing"),
+])
+def test_tag_extraction(reply, expected, outcome):
+    misses = metrics.tag_extractions.values[("answer", outcome)]
+
+    assert extract_tag(reply, "answer") == expected
+    assert metrics.tag_extractions.values[("answer", outcome)] == misses + 1
+
+    # streamed in any chunk size, the same text comes out
+    for size in [1, 3, 16]:
+        stripper = TagStripper("answer")
+        streamed = "".join(stripper.feed(reply[index:index + size]) for index in range(0, len(reply), size)) + stripper.flush()
+        assert streamed == expected
+        assert stripper.buffer == ""
+
+def test_tag_stripper_holds_back_only_a_partial_tag():
+    stripper = TagStripper("answer")
+    stripper.feed("<answer>")
+    for _ in range(1000):
+        stripper.feed("x" * 20 + "</ans")
+        assert len(stripper.buffer) <= len("</answer>")
+
+def test_prompt_registry(tmp_path, monkeypatch):
+    (tmp_path / "greeting.v1.txt").write_text("Hello")
+    (tmp_path / "greeting.v2.txt").write_text("Hi there")
+    monkeypatch.setattr(prompts, "PROMPTS_DIR", str(tmp_path))
+    prompts.available.cache_clear()
+    prompts.load_prompt.cache_clear()
+    try:
+        assert prompts.load_prompt("greeting") == "Hi there"
+        assert prompts.load_prompt("greeting", 1) == "Hello"
+        
+        # a pinned version wins over the newest one
+        monkeypatch.setitem(prompts.PROMPT_VERSIONS, "greeting", 1)
+        assert prompts.current_version("greeting") == 1
+        
+        monkeypatch.setitem(prompts.PROMPT_VERSIONS, "greeting", 3)
+        with pytest.raises(prompts.PromptNotFound):
+            prompts.current_version("greeting")
+        with pytest.raises(prompts.PromptNotFound):
+            prompts.load_prompt("farewell")
+    finally:
+        prompts.available.cache_clear()
+        prompts.load_prompt.cache_clear()
+
+def test_import_leaves_heavy_modules_unloaded():
+    # fitz, the Anthropic SDK and numpy are loaded by the first request that needs them, not by importing the app
+    script = "import sys, main; print(','.join(name for name in ['fitz', 'anthropic', 'httpx', 'numpy'] if name in sys.modules))"
+    loaded = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert loaded.stdout.strip() == ""
+
+def test_stub_backend_streams_incrementally(monkeypatch):
+    if llm.LLM_BACKEND != "stub":
+        pytest.skip("LLM_BACKEND isn't the stub")
+    monkeypatch.setattr(stub_llm, "STUB_LLM_LATENCY", 0.5)
+    
+    async def exercise():
+        started = time.monotonic()
+        arrivals = []
+        async with llm.get_client().messages.stream(model="stub", max_tokens=100, system="<answer>", messages=[{"role": "user", "content": "Hi"}]) as stream:
+            async for _ in stream.text_stream:
+                arrivals.append(time.monotonic() - started)
+        return arrivals
+    
+    # deltas arrive spread over the completion time instead of in one burst at the end
+    arrivals = asyncio.run(exercise())
+    assert len(arrivals) > 2
+    assert arrivals[-1] - arrivals[0] > 0.2
+
+@pytest.fixture
+def inject_faults():
+    # queues faults on the in-process stub LLM; skipped when the tests talk to the real API
+    if llm.LLM_BACKEND != "stub":
+        pytest.skip("LLM_BACKEND isn't the stub")
+    
+    yield stub_llm.faults.update
+    stub_llm.faults.update(fail_next=0, status=529, delay_next=0, delay=0.0)
+    breaker.reset()
+
+def test_transient_overload_is_retried(inject_faults, monkeypatch):
+    monkeypatch.setattr(call_policy, "LLM_RETRY_BASE_DELAY", 0.05)
+    retries = call_policy.counters["retries"]
+    inject_faults(fail_next=2, status=529)
+    
+    response = client.post(URL + "/create-conversation", json={"prompt": "How do I explain a gap in my resume?", "defer_tag": True, "no_cache": True})
+    
+    assert response.status_code == 200
+    assert response.json()["error"] == False
+    assert call_policy.counters["retries"] - retries == 2
+
+def test_circuit_breaker_fails_fast(inject_faults, monkeypatch):
+    monkeypatch.setattr(call_policy, "LLM_RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(breaker, "threshold", 2)
+    inject_faults(fail_next=10, status=529)
+    payload = {"prompt": "What should I wear to an interview?", "defer_tag": True, "no_cache": True}
+    
+    # two overloaded answers open the circuit, so the third attempt is refused without calling upstream
+    response = client.post(URL + "/create-conversation", json=payload)
+    assert response.status_code == 503
+    assert breaker.state() == "open"
+    
+    rejections = call_policy.counters["circuit_rejections"]
+    response = client.post(URL + "/create-conversation", json=payload)
+    assert response.status_code == 503
+    assert call_policy.counters["circuit_rejections"] == rejections + 1
+    
+    stats = client.get(URL + "/scheduler-stats").json()["data"]["upstream"]
+    assert stats["circuit"] == "open"
+
+def test_slow_chat_call_is_hedged(inject_faults, monkeypatch):
+    monkeypatch.setattr(call_policy.POLICIES["chat"], "hedge_after", 0.1)
+    hedge_wins = call_policy.counters["hedge_wins"]
+    inject_faults(delay_next=1, delay=3.0)
+    
+    started = time.monotonic()
+    response = client.post(URL + "/create-conversation", json={"prompt": "How do I answer why I'm leaving my job?", "defer_tag": True, "no_cache": True})
+    
+    assert response.status_code == 200
+    assert time.monotonic() - started < 2.5
+    assert call_policy.counters["hedge_wins"] == hedge_wins + 1
+
+def test_failed_tag_cancels_chat_call(inject_faults, monkeypatch):
+    monkeypatch.setattr(stub_llm, "STUB_LLM_LATENCY", 1.0)
+    
+    async def failing_tag(prompt):
+        await asyncio.sleep(0.05)
+        raise ValueError("tag failed")
+    monkeypatch.setattr(chatAi, "generate_tag", failing_tag)
+    
+    started = time.monotonic()
+    response = client.post(URL + "/create-conversation", json={"prompt": "How do I follow up after an interview?", "no_cache": True})
+    
+    assert response.status_code == 500
+    assert time.monotonic() - started < 0.9
+    # the chat call was cancelled with the request and gave back its slot
+    assert client.get(URL + "/scheduler-stats").json()["data"]["active"] == 0
+
+def test_hedge_cancels_first_attempt_when_abandoned():
+    async def exercise():
+        state = {"cancelled": False}
+        
+        async def request():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                state["cancelled"] = True
+                raise
+        
+        # the deadline fires before the hedge would have been sent
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(call_policy.hedged(request, 0.5), 0.2)
+        await asyncio.sleep(0)
+        return state["cancelled"]
+
+    assert asyncio.run(exercise())
+
+def test_deadline_exceeded(inject_faults, monkeypatch):
+    monkeypatch.setattr(call_policy.POLICIES["chat"], "deadline", 0.3)
+    inject_faults(delay_next=1, delay=2.0)
+    
+    response = client.post(URL + "/create-conversation", json={"prompt": "How long should my interview answers be?", "defer_tag": True, "no_cache": True})
+    
+    assert response.status_code == 504
+    assert response.json()["error"] == True
+
 # def helper_func(url, payload, status_code, message, error, data_type):
 #     response = requests.post(url, data=payload)
 